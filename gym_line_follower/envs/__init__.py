@@ -1 +1,3 @@
 from gym_line_follower.envs.line_follower_env import LineFollowerEnv, LineFollowerCameraEnv
+from gym_line_follower.envs.line_follower_vec_env import LineFollowerVecEnv
+from gym_line_follower.envs.subproc_vec_env import LineFollowerSubprocVecEnv
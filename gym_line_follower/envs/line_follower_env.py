@@ -2,20 +2,15 @@ import os
 import json
 import warnings
 from time import time, sleep
-import tempfile
 
-import gym
 from gym import spaces
-from gym.utils import seeding
 import numpy as np
-import pybullet as p
 
-from gym_line_follower.track import Track
-from gym_line_follower.track_plane_builder import build_track_plane
-from gym_line_follower.bullet_client import BulletClient
+from gym_line_follower.envs.track_world_env import TrackWorldEnv
+from gym_line_follower.track_plane_builder import TrackPlane
 from gym_line_follower.line_follower_bot import LineFollowerBot
 from gym_line_follower.randomizer_dict import RandomizerDict
-from gym_line_follower.utils import TrackRefImg
+from gym_line_follower.pov_renderer import CameraBuffer
 
 def fig2rgb_array(fig):
     fig.canvas.draw()
@@ -24,15 +19,14 @@ def fig2rgb_array(fig):
     return np.fromstring(buf, dtype=np.uint8).reshape(nrows, ncols, 3)
 
 
-class LineFollowerEnv(gym.Env):
+class LineFollowerEnv(TrackWorldEnv):
     metadata = {"render.modes": ["human", "gui", "rgb_array", "pov"]}
 
-    SUPPORTED_OBSV_TYPE = ["points_visible", "points_latch", "points_latch_bool", "camera","ir_array"]
-    SUPPORTED_TRACK_TYPE = ["simple", "robotracer"]
-
     def __init__(self, gui=True, nb_cam_pts=8, sub_steps=10, sim_time_step=1 / 250,
                  max_track_err=0.3, power_limit=0.4, max_time=60, config=None, randomize=True, obsv_type="points_latch",
-                 track=None, track_type="simple" , track_render_params=None):
+                 track=None, track_type="simple" , track_render_params=None, pb_client=None, origin=(0., 0.),
+                 track_cache=None, track_bank=None, camera_resolution=(320, 240), camera_channels="rgb",
+                 camera_dtype="uint8", camera_frame_skip=1, warm_reset=False, snapshot_pool_size=64):
         """
         Create environment.
         :param gui: True to enable pybullet OpenGL GUI
@@ -52,15 +46,45 @@ class LineFollowerEnv(gym.Env):
                                 are visible in camera window, otherwise returns previous observation
                             "points_latch_bool" - same as "latch" with one additional value to indicate if line is
                                 visible or not (0 or 1) - shape (2 * nb_cam_pts + 1)
-                            "camera" - return (240, 320, 3) camera image RGB array
+                            "camera" - return camera image array, (240, 320, 3) RGB by default, see camera_* arguments
+                            "camera_fast" - same as "camera" but rendered in software from track image, without
+                                pybullet rendering. Only track is visible.
                             "ir_array" - return array of lenght irsensor_array_number with the ir line sensor readings
         :param track: Optional track instance to use. If none track is generated randomly.
         :param track_type: track type to generate
         :param track_render_params: Track render parameters dict.
+        :param pb_client: Optional pybullet client shared with other environments. When provided, the environment does
+                          not own the simulation: world reset and track plane loading are left to the owner (see
+                          LineFollowerVecEnv) and only the bot is (re)loaded on reset.
+        :param origin: world position (x, y) of the track origin, used to place several bots in one pybullet world
+        :param track_cache: TrackAssetCache instance used to reuse rendered track assets of repeated tracks.
+                            If None process wide default cache is used, False to disable caching.
+        :param track_bank: Optional TrackBank instance or path to track bank archive. If provided, tracks are sampled
+                           from the bank instead of being generated. Ignored when track is provided. Bank opened
+                           from a path is closed by close().
+        :param camera_resolution: (width, height) of camera observation images
+        :param camera_channels: channels of camera observation images: "rgb" - shape (height, width, 3), "gray" -
+                                shape (height, width, 1), "binary" - line mask shape (height, width, 1)
+        :param camera_dtype: "uint8" for pixel values in range [0, 255], "float32" for range [0, 1]
+        :param camera_frame_skip: render new camera image every camera_frame_skip steps, previous image is returned in
+                                  between.
+                                  Camera images are rendered into a preallocated buffer that is reused on every step,
+                                  copy observations to keep them.
+        :param warm_reset: True to keep the pybullet world loaded between episodes when the track did not change
+                           (preset track, track bank or fixed seed with track cache). Bot is moved to the start pose
+                           instead of reloading the world. Simulation is not reset, so episodes may differ slightly
+                           from episodes after a full reset.
+        :param snapshot_pool_size: maximal number of snapshots kept in memory, see snapshot()
         """
 
+        super(LineFollowerEnv, self).__init__(gui=gui, sim_time_step=sim_time_step, randomize=randomize,
+                                              obsv_type=obsv_type, track=track, track_type=track_type,
+                                              track_render_params=track_render_params, pb_client=pb_client,
+                                              track_cache=track_cache, track_bank=track_bank,
+                                              camera_resolution=camera_resolution, camera_channels=camera_channels,
+                                              snapshot_pool_size=snapshot_pool_size)
+
         self.local_dir = os.path.dirname(os.path.dirname(__file__))
-        self.track_dir = tempfile.TemporaryDirectory(prefix="linegym_")
 
         if config is None:
             config_path = os.path.join(self.local_dir, "bot_config.json")
@@ -70,30 +94,18 @@ class LineFollowerEnv(gym.Env):
         else:
             self.config = config
 
-        self.gui = gui
         self.nb_cam_pts = nb_cam_pts
         self.sub_steps = sub_steps
-        self.sim_time_step = sim_time_step
         self.max_track_err = max_track_err
         self.speed_limit = power_limit
         self.max_time = max_time
         self.max_steps = max_time / (sim_time_step * sub_steps)
-
-        self.randomize = randomize
-        self.obsv_type = obsv_type.lower()
-        self.track_render_params = track_render_params
-        self.preset_track = track
-        self.track_type = track_type.lower()
-        self.built_track = False
-
-        if self.track_type not in self.SUPPORTED_TRACK_TYPE:
-            raise ValueError("Track type '{}' not supported.".format(self.track_type))
+        self.camera_frame_skip = camera_frame_skip
+        self.camera_buffer = None
+        self.warm_reset = warm_reset
 
         self.action_space = spaces.Box(low=-1.0, high=1.0, shape=(2,), dtype=np.float64)
 
-        if self.obsv_type not in self.SUPPORTED_OBSV_TYPE:
-            raise ValueError("Observation type '{}' not supported.".format(self.obsv_type))
-
         if self.obsv_type == "points_visible":
             self.observation_space = spaces.Box(low=np.array([0.0, -0.2, 0.] * self.nb_cam_pts),
                                                 high=np.array([0.3, 0.2, 1.] * self.nb_cam_pts),
@@ -110,27 +122,23 @@ class LineFollowerEnv(gym.Env):
             self.observation_space = spaces.Box(low=np.array(low),
                                                 high=np.array(high),
                                                 dtype=np.float32)
-        elif self.obsv_type == "camera":
-            self.observation_space = spaces.Box(low=0, high=255, shape=(240, 320, 3), dtype=np.uint8)
+        elif self.obsv_type in ["camera", "camera_fast"]:
+            self.camera_buffer = CameraBuffer(self.camera_resolution, self.camera_channels, camera_dtype)
+            self.observation_space = spaces.Box(low=0, high=self.camera_buffer.high, shape=self.camera_buffer.shape,
+                                                dtype=self.camera_buffer.dtype)
         elif self.obsv_type == "ir_array":
             sen_num = self.config["irsensor_array_number"]
             self.observation_space = spaces.Box(low=np.array([0.0] * sen_num),
                                                 high=np.array([1.0] * sen_num),
                                                 dtype=np.float64)
 
-        self.pb_client: p = BulletClient(connection_mode=p.GUI if self.gui else p.DIRECT)
-        self.pb_client.setPhysicsEngineParameter(enableFileCaching=0)
-        p.resetDebugVisualizerCamera(cameraDistance=2.6, cameraYaw=45, cameraPitch=-45, cameraTargetPosition=[0, 0, 0])
-        p.configureDebugVisualizer(p.COV_ENABLE_GUI, 0)
-
-        self.np_random = None
+        self.origin = origin
         self.step_counter = 0
         self.observation = []
 
         self._render_time = 0.
 
         self.follower_bot: LineFollowerBot = None
-        self.track: Track = None
 
         self.position_on_track = 0.
         self.prev_track_distance = 0.
@@ -145,41 +153,40 @@ class LineFollowerEnv(gym.Env):
         self.step_counter = 0
         self.config.randomize()
 
-        self.pb_client.resetSimulation()
-        self.pb_client.setTimeStep(self.sim_time_step)
-        self.pb_client.setGravity(0, 0, -9.81)
-
         if self.randomize:
             if self.track_render_params:
                 self.track_render_params.randomize()
 
-        if self.preset_track:
-            self.track = self.preset_track
-            self.track.reset_progress()
-        else:
-            if self.track_type == "simple":
-                self.track = Track.generate(1.75, hw_ratio=0.7, seed=None if self.randomize else 4125,
-                                        spikeyness=0.3, nb_checkpoints=500, render_params=self.track_render_params)
-            elif self.track_type == "robotracer":
-                self.track = Track.generate_robotracer(1.75, seed=None if self.randomize else 4125,
-                                        nb_checkpoints=500, render_params=self.track_render_params)
-            self.built_track = False
+        self.track = self._next_track()
 
         start_yaw = self.track.start_angle
         if self.randomize:
             start_yaw += np.random.uniform(-0.2, 0.2)
 
-        if not self.built_track:
-            img=build_track_plane(self.track, ppm=1500, path=self.track_dir.name)
-            self.built_track=True
+        if self.owns_client:
+            img = self._render_track()
+            # Loaded world is kept only if track did not change
+            if not (self.warm_reset and img is self._track_texture and self.follower_bot is not None):
+                self._reset_world()
+                self.follower_bot = None
+                self._update_track_images(img)
+
+                self.track_plane = TrackPlane(self.pb_client, self.track, img, texture_dir=self.track_dir.name)
+                if self.gui or self.obsv_type == "camera":
+                    self.track_plane.load_texture()
+        elif self.follower_bot is not None and not self.warm_reset:
+            # Shared world, only the bot of this env is replaced
+            self.pb_client.removeBody(self.follower_bot.bot)
+            self.follower_bot = None
+
+        if self.follower_bot is None:
+            self.follower_bot = LineFollowerBot(self.pb_client, self.nb_cam_pts, self.track.start_xy, start_yaw,
+                                                self.config, obsv_type=self.obsv_type, track_img=self.track_img,
+                                                origin=self.origin, pov_renderer=self.pov_renderer,
+                                                camera_buffer=self.camera_buffer,
+                                                camera_frame_skip=self.camera_frame_skip)
         else:
-            img = self.track.render(ppm=1500)
-        track_img = TrackRefImg(img,1500)
-
-        self.pb_client.loadURDF(os.path.join(self.track_dir.name, "track_plane.generated.urdf"))
-
-        self.follower_bot = LineFollowerBot(self.pb_client, self.nb_cam_pts, self.track.start_xy, start_yaw,
-                                            self.config, obsv_type=self.obsv_type, track_img=track_img)
+            self.follower_bot.reset(self.track.start_xy, start_yaw)
 
         self.position_on_track = 0.
 
@@ -194,7 +201,8 @@ class LineFollowerEnv(gym.Env):
             return self.reset()  # TODO: maybe add recursion limit
         else:
             obsv = self.follower_bot.step(self.track)
-            if self.obsv_type == "latch_bool":
+            self.observation = obsv
+            if self.obsv_type == "points_latch_bool":
                 obsv = [obsv, 1.]
             return obsv
 
@@ -204,12 +212,19 @@ class LineFollowerEnv(gym.Env):
         if self.done:
             warnings.warn("Calling step() on done environment.")
 
-        reward = 0.
-
         for _ in range(self.sub_steps):
             self.follower_bot.apply_action(action)
             self.pb_client.stepSimulation()
 
+        return self._evaluate_step()
+
+    def _evaluate_step(self):
+        """
+        Generate observation, reward and done flag after the simulation was stepped.
+        :return: observation, reward, done, info
+        """
+        reward = 0.
+
         # Bot position updated here so it must be first!
         observation = self.follower_bot.step(self.track)
 
@@ -229,7 +244,7 @@ class LineFollowerEnv(gym.Env):
                 self.observation = observation
                 observation = [observation, 1.]
 
-        elif self.obsv_type == "camera":
+        elif self.obsv_type in ["camera", "camera_fast"]:
             self.observation = observation
 
         elif self.obsv_type == "ir_array":
@@ -271,6 +286,34 @@ class LineFollowerEnv(gym.Env):
         self.done = done
         return observation, reward, done, info
 
+    def _get_state(self):
+        """
+        Get Python side state of episode, see snapshot().
+        :return: state dict
+        """
+        return {"track": self.track,
+                "track_progress": (self.track.progress, self.track.progress_idx, self.track.next_checkpoint_idx,
+                                   self.track.done),
+                "position_on_track": self.position_on_track,
+                "observation": self.observation,
+                "step_counter": self.step_counter,
+                "done": self.done,
+                "bot": self.follower_bot.get_state()}
+
+    def _set_state(self, state):
+        """
+        Restore Python side state of episode.
+        :param state: state dict returned by _get_state()
+        """
+        self.track = state["track"]
+        self.track.progress, self.track.progress_idx, self.track.next_checkpoint_idx, self.track.done = \
+            state["track_progress"]
+        self.position_on_track = state["position_on_track"]
+        self.observation = state["observation"]
+        self.step_counter = state["step_counter"]
+        self.done = state["done"]
+        self.follower_bot.set_state(state["bot"])
+
     def render(self, mode='human'):
         if self.plot is None and mode in ["human", "rgb_array"]:
             global plt
@@ -348,10 +391,16 @@ class LineFollowerEnv(gym.Env):
             img = fig2rgb_array(self.plot["fig"])
             return img
         elif mode == "gui":  # Sleep to make GUI realtime
+            if self.track_plane is not None:
+                self.track_plane.load_texture()
             while time() - self._render_time < (self.sim_time_step*self.sub_steps-0.001):
                 sleep(0.001)
             self._render_time = time()
         elif mode == "pov":
+            if self.obsv_type == "camera_fast":
+                return self.follower_bot.get_fast_pov_image()
+            if self.track_plane is not None:
+                self.track_plane.load_texture()
             return self.follower_bot.get_pov_image()
         else:
             super(LineFollowerEnv, self).render(mode=mode)
@@ -360,12 +409,17 @@ class LineFollowerEnv(gym.Env):
         if self.plot:
             plt.close(self.plot["fig"])
             plt.ioff()
-        self.track_dir.cleanup()
-        return
+        super(LineFollowerEnv, self).close()
 
-    def seed(self, seed=None):
-        self.np_random, seed = seeding.np_random(seed)
-        return [seed]
+    def flatten_observation(self, observation):
+        """
+        Convert observation returned by reset() or step() to an array matching observation_space.
+        :param observation: observation
+        :return: array, shape and dtype of observation_space
+        """
+        if self.obsv_type == "points_latch_bool":
+            observation = np.append(*observation)
+        return np.reshape(observation, self.observation_space.shape).astype(self.observation_space.dtype, copy=False)
 
     def _get_info(self):
         (x, y), yaw = self.follower_bot.pos
@@ -0,0 +1,167 @@
+import copy
+import math
+
+import numpy as np
+
+from gym_line_follower.envs.track_world_env import TrackWorldEnv
+from gym_line_follower.envs.line_follower_env import LineFollowerEnv
+from gym_line_follower.track_plane_builder import TrackPlane
+
+
+class LineFollowerVecEnv(TrackWorldEnv):
+    """
+    Vectorized line follower environment. Steps a number of bots inside one pybullet world, each bot drives on
+    its own copy of the track plane. Track planes are tiled in a grid so bots can not interact with each other.
+    All bots share one track, a new track is generated only when the whole vector environment is reset.
+    Sub-environments that finish an episode are reset automatically on the same track.
+    """
+
+    def __init__(self, num_envs=4, gui=False, border_w=0.3, sim_time_step=1 / 250, randomize=True,
+                 obsv_type="points_latch", track=None, track_type="simple", track_render_params=None, track_cache=None,
+                 track_bank=None, camera_resolution=(320, 240), camera_channels="rgb", snapshot_pool_size=64,
+                 **kwargs):
+        """
+        Create vectorized environment. Track and world arguments are the same as of LineFollowerEnv and apply to the
+        shared world.
+        :param num_envs: number of bots simulated in parallel
+        :param gui: True to enable pybullet OpenGL GUI
+        :param border_w: track plane outside border width in meters, determines spacing of tiled track planes
+        :param kwargs: remaining LineFollowerEnv arguments (bot, observation and reward parameters), applied to each
+                       sub-environment
+        """
+        super(LineFollowerVecEnv, self).__init__(gui=gui, sim_time_step=sim_time_step, randomize=randomize,
+                                                 obsv_type=obsv_type, track=track, track_type=track_type,
+                                                 track_render_params=track_render_params, track_cache=track_cache,
+                                                 track_bank=track_bank, camera_resolution=camera_resolution,
+                                                 camera_channels=camera_channels,
+                                                 snapshot_pool_size=snapshot_pool_size)
+        self.num_envs = num_envs
+        self.border_w = border_w
+
+        # Sub-environments only drive bots in the world of this env, the track is set on reset()
+        env_kwargs = dict(kwargs, gui=False, pb_client=self.pb_client, sim_time_step=sim_time_step,
+                          randomize=randomize, obsv_type=obsv_type, track_cache=False,
+                          camera_resolution=camera_resolution, camera_channels=camera_channels)
+        self.envs = [LineFollowerEnv(**env_kwargs) for _ in range(num_envs)]
+        self.action_space = self.envs[0].action_space
+        self.observation_space = self.envs[0].observation_space
+        self.sub_steps = self.envs[0].sub_steps
+        self.speed_limit = self.envs[0].speed_limit
+
+    def reset(self):
+        """
+        Reset the world and all sub-environments.
+        :return: stacked observations, array shape (num_envs, *observation_space.shape)
+        """
+        self._reset_world()
+
+        if self.randomize:
+            if self.track_render_params:
+                self.track_render_params.randomize()
+
+        self.track = self._next_track()
+
+        img = self._render_track(self.border_w)
+        self._update_track_images(img, self.border_w)
+
+        tile_w = self.track.width + 2 * self.border_w
+        tile_h = self.track.height + 2 * self.border_w
+        nb_cols = int(math.ceil(math.sqrt(self.num_envs)))
+        origins = [((i % nb_cols) * tile_w, (i // nb_cols) * tile_h) for i in range(self.num_envs)]
+        self.track_plane = TrackPlane(self.pb_client, self.track, img, border_w=self.border_w, origins=origins,
+                                      texture_dir=self.track_dir.name)
+        if self.gui or self.obsv_type == "camera":
+            self.track_plane.load_texture()
+
+        observations = []
+        for env, origin in zip(self.envs, origins):
+            # Bodies were removed by resetSimulation
+            env.follower_bot = None
+            env.origin = origin
+            # Each bot tracks its own progress so it needs its own track instance
+            env.preset_track = copy.copy(self.track)
+            env.track_img = self.track_img
+            env.pov_renderer = self.pov_renderer
+            env.track_plane = self.track_plane
+            observations.append(env.reset())
+
+        return self._stack_observations(observations)
+
+    def step(self, actions):
+        """
+        Step all sub-environments. Sub-environments that are done are reset and the last observation of the finished
+        episode is returned in info under key "terminal_observation", as array matching observation_space.
+        :param actions: array like shape (num_envs, 2)
+        :return: observations, rewards, dones, infos
+        """
+        actions = self.speed_limit * np.asarray(actions, dtype=np.float64).reshape((self.num_envs, 2))
+
+        for _ in range(self.sub_steps):
+            for env, action in zip(self.envs, actions):
+                env.follower_bot.apply_action(action)
+            self.pb_client.stepSimulation()
+
+        observations = []
+        rewards = np.zeros(self.num_envs, dtype=np.float64)
+        dones = np.zeros(self.num_envs, dtype=bool)
+        infos = []
+        for i, env in enumerate(self.envs):
+            observation, rewards[i], dones[i], info = env._evaluate_step()
+            if dones[i]:
+                info["terminal_observation"] = env.flatten_observation(observation)
+                if not env.warm_reset:
+                    # Bot body is replaced, saved states no longer match the world
+                    self.clear_snapshots()
+                observation = env.reset()
+            observations.append(observation)
+            infos.append(info)
+
+        return self._stack_observations(observations), rewards, dones, infos
+
+    def render(self, mode='human'):
+        """
+        Render first sub-environment.
+        """
+        return self.envs[0].render(mode=mode)
+
+    def close(self):
+        for env in self.envs:
+            env.close()
+        super(LineFollowerVecEnv, self).close()
+
+    def seed(self, seed=None):
+        seeds = super(LineFollowerVecEnv, self).seed(seed)
+        for i, env in enumerate(self.envs):
+            seeds += env.seed(None if seed is None else seed + i + 1)
+        return seeds
+
+    def _get_state(self):
+        return [(env.follower_bot, env._get_state()) for env in self.envs]
+
+    def _set_state(self, state):
+        for env, (follower_bot, env_state) in zip(self.envs, state):
+            env.follower_bot = follower_bot
+            env._set_state(env_state)
+
+    def _stack_observations(self, observations):
+        """
+        Stack sub-environment observations into one array.
+        :param observations: list of observations
+        :return: array shape (num_envs, *observation_space.shape)
+        """
+        out = np.zeros((self.num_envs, *self.observation_space.shape), dtype=self.observation_space.dtype)
+        for i, observation in enumerate(observations):
+            out[i] = self.envs[0].flatten_observation(observation)
+        return out
+
+
+if __name__ == '__main__':
+    from time import time
+
+    env = LineFollowerVecEnv(num_envs=8, obsv_type="points_latch")
+    env.reset()
+    start = time()
+    for _ in range(1000):
+        obsv, rew, done, info = env.step(np.random.uniform(0.3, 0.6, size=(env.num_envs, 2)))
+    print("Steps per second: {:.1f}".format(1000 * env.num_envs / (time() - start)))
+    env.close()
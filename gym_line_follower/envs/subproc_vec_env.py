@@ -0,0 +1,209 @@
+import os
+import ctypes
+import multiprocessing as mp
+
+import numpy as np
+
+from gym_line_follower.envs.line_follower_env import LineFollowerEnv
+
+
+def _shared_array(ctx, shape, dtype):
+    """
+    Allocate shared memory for an array. Memory is not synchronized, processes write to disjoint rows.
+    :param ctx: multiprocessing context
+    :param shape: array shape
+    :param dtype: numpy dtype
+    :return: shared ctypes byte array
+    """
+    return ctx.RawArray(ctypes.c_uint8, int(np.prod(shape)) * np.dtype(dtype).itemsize)
+
+
+def _as_array(buffer, shape, dtype):
+    """
+    Numpy view of a shared buffer, no data is copied.
+    """
+    return np.frombuffer(buffer, dtype=dtype).reshape(shape)
+
+
+def _worker(remote, parent_remote, index, env_kwargs, buffers, cpu):
+    """
+    Subprocess main loop. Environment results are written directly to shared buffers row `index`, only commands and
+    info dicts are sent over the pipe.
+    """
+    parent_remote.close()
+    if cpu is not None and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, [cpu])
+
+    env = LineFollowerEnv(gui=False, **env_kwargs)
+    observations, terminal_observations, actions, rewards, dones = \
+        [_as_array(buffer, shape, dtype) for buffer, shape, dtype in buffers]
+    try:
+        while True:
+            cmd, data = remote.recv()
+            if cmd == "step":
+                observation, reward, done, info = env.step(actions[index])
+                if done:
+                    terminal_observations[index] = env.flatten_observation(observation)
+                    observation = env.reset()
+                observations[index] = env.flatten_observation(observation)
+                rewards[index] = reward
+                dones[index] = done
+                remote.send(info)
+            elif cmd == "reset":
+                observations[index] = env.flatten_observation(env.reset())
+                remote.send(None)
+            elif cmd == "seed":
+                remote.send(env.seed(data))
+            elif cmd == "close":
+                break
+            else:
+                raise ValueError("Unknown command '{}'.".format(cmd))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        env.close()
+        remote.close()
+
+
+class LineFollowerSubprocVecEnv:
+    """
+    Vectorized environment running each LineFollowerEnv in its own process. Observations, actions, rewards and
+    dones are exchanged through preallocated shared memory arrays so no observation data is pickled, which matters
+    most for camera observations. Sub-environments that are done are reset automatically.
+    """
+
+    def __init__(self, num_envs=4, env_kwargs=None, cpu_affinity=None, start_method="forkserver"):
+        """
+        Start worker processes.
+        :param num_envs: number of worker processes
+        :param env_kwargs: LineFollowerEnv arguments dict, or list of dicts with one entry per worker
+        :param cpu_affinity: None to leave scheduling to OS, True to pin worker i to i-th core available to this
+                             process, or list of core ids with one entry per worker. Pinning is only available on
+                             platforms with os.sched_setaffinity.
+        :param start_method: multiprocessing start method, None for platform default
+        """
+        if env_kwargs is None:
+            env_kwargs = {}
+        if isinstance(env_kwargs, dict):
+            env_kwargs = [env_kwargs] * num_envs
+        if len(env_kwargs) != num_envs:
+            raise ValueError("Length of env_kwargs must match num_envs.")
+        if cpu_affinity is True:
+            # Only cores this process may run on, ids are not necessarily contiguous
+            if hasattr(os, "sched_getaffinity"):
+                cpus = sorted(os.sched_getaffinity(0))
+            else:
+                cpus = list(range(os.cpu_count()))
+            cpu_affinity = [cpus[i % len(cpus)] for i in range(num_envs)]
+        elif cpu_affinity is None:
+            cpu_affinity = [None] * num_envs
+        if len(cpu_affinity) != num_envs:
+            raise ValueError("Length of cpu_affinity must match num_envs.")
+
+        self.num_envs = num_envs
+
+        # Get spaces from a temporary environment, workers are started afterwards
+        dummy_env = LineFollowerEnv(gui=False, **env_kwargs[0])
+        self.observation_space = dummy_env.observation_space
+        self.action_space = dummy_env.action_space
+        dummy_env.close()
+        dummy_env.pb_client.disconnect()
+        del dummy_env
+
+        ctx = mp.get_context(start_method)
+        obs_shape = (num_envs, *self.observation_space.shape)
+        obs_dtype = self.observation_space.dtype
+        self._buffer_specs = [(obs_shape, obs_dtype),
+                              (obs_shape, obs_dtype),
+                              ((num_envs, *self.action_space.shape), self.action_space.dtype),
+                              ((num_envs,), np.float64),
+                              ((num_envs,), np.bool_)]
+        buffers = [(_shared_array(ctx, shape, dtype), shape, dtype) for shape, dtype in self._buffer_specs]
+        self._observations, self._terminal_observations, self._actions, self._rewards, self._dones = \
+            [_as_array(buffer, shape, dtype) for buffer, shape, dtype in buffers]
+
+        self.remotes, work_remotes = zip(*[ctx.Pipe() for _ in range(num_envs)])
+        self.processes = []
+        for i, (remote, work_remote) in enumerate(zip(self.remotes, work_remotes)):
+            process = ctx.Process(target=_worker,
+                                  args=(work_remote, remote, i, env_kwargs[i], buffers, cpu_affinity[i]),
+                                  daemon=True)
+            process.start()
+            self.processes.append(process)
+            work_remote.close()
+
+        self.waiting = False
+        self.closed = False
+
+    def reset(self):
+        """
+        Reset all sub-environments.
+        :return: observations, array shape (num_envs, *observation_space.shape)
+        """
+        for remote in self.remotes:
+            remote.send(("reset", None))
+        for remote in self.remotes:
+            remote.recv()
+        return self._observations.copy()
+
+    def step_async(self, actions):
+        """
+        Start stepping all sub-environments, results are collected with step_wait().
+        :param actions: array like shape (num_envs, 2)
+        """
+        if self.waiting:
+            raise RuntimeError("step_async() called twice without step_wait().")
+        self._actions[...] = np.reshape(actions, self._actions.shape)
+        for remote in self.remotes:
+            remote.send(("step", None))
+        self.waiting = True
+
+    def step_wait(self):
+        """
+        Wait for step started with step_async(). Last observation of a finished episode is returned in info under key
+        "terminal_observation".
+        :return: observations, rewards, dones, infos
+        """
+        infos = [remote.recv() for remote in self.remotes]
+        self.waiting = False
+        dones = self._dones.copy()
+        for i in np.flatnonzero(dones):
+            infos[i]["terminal_observation"] = self._terminal_observations[i].copy()
+        return self._observations.copy(), self._rewards.copy(), dones, infos
+
+    def step(self, actions):
+        self.step_async(actions)
+        return self.step_wait()
+
+    def seed(self, seed=None):
+        for i, remote in enumerate(self.remotes):
+            remote.send(("seed", None if seed is None else seed + i))
+        return [remote.recv() for remote in self.remotes]
+
+    def close(self):
+        if self.closed:
+            return
+        if self.waiting:
+            for remote in self.remotes:
+                remote.recv()
+        for remote in self.remotes:
+            remote.send(("close", None))
+        for process in self.processes:
+            process.join()
+        self.closed = True
+
+    def __del__(self):
+        if not getattr(self, "closed", True):
+            self.close()
+
+
+if __name__ == '__main__':
+    from time import time
+
+    env = LineFollowerSubprocVecEnv(num_envs=4, env_kwargs={"obsv_type": "camera"}, cpu_affinity=True)
+    env.reset()
+    start = time()
+    for _ in range(100):
+        obsv, rew, done, info = env.step(np.random.uniform(0.3, 0.6, size=(env.num_envs, 2)))
+    print("Steps per second: {:.1f}".format(100 * env.num_envs / (time() - start)))
+    env.close()
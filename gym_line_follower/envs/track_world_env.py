@@ -0,0 +1,249 @@
+import tempfile
+from collections import OrderedDict
+
+import gym
+from gym.utils import seeding
+import pybullet as p
+
+from gym_line_follower.track import Track
+from gym_line_follower.track_plane_builder import TrackPlane
+from gym_line_follower.track_cache import get_default_track_cache
+from gym_line_follower.track_bank import TrackBank
+from gym_line_follower.bullet_client import BulletClient
+from gym_line_follower.line_follower_bot import LineFollowerBot
+from gym_line_follower.utils import TrackRefImg
+from gym_line_follower.pov_renderer import PovRenderer
+
+
+class TrackWorldEnv(gym.Env):
+    """
+    Base of line follower environments. Holds the pybullet world and the track: track generation, rendering of track
+    images, track plane and snapshots. Bots, observations and rewards are left to subclasses.
+    """
+
+    SUPPORTED_OBSV_TYPE = ["points_visible", "points_latch", "points_latch_bool", "camera", "camera_fast", "ir_array"]
+    SUPPORTED_TRACK_TYPE = ["simple", "robotracer"]
+
+    def __init__(self, gui=True, sim_time_step=1 / 250, randomize=True, obsv_type="points_latch", track=None,
+                 track_type="simple", track_render_params=None, pb_client=None, track_cache=None, track_bank=None,
+                 camera_resolution=(320, 240), camera_channels="rgb", snapshot_pool_size=64):
+        """
+        Create pybullet world, or attach to a shared one.
+        :param gui: True to enable pybullet OpenGL GUI
+        :param sim_time_step: pybullet simulation time step
+        :param randomize: when True, track is generated randomly at each episode start
+        :param obsv_type: type of line observation, determines which track images are needed, see LineFollowerEnv
+        :param track: Optional track instance to use. If none track is generated randomly.
+        :param track_type: track type to generate
+        :param track_render_params: Track render parameters dict.
+        :param pb_client: Optional pybullet client shared with other environments. When provided, the environment does
+                          not own the simulation and does not reset the world or load the track plane.
+        :param track_cache: TrackAssetCache instance used to reuse rendered track assets of repeated tracks.
+                            If None process wide default cache is used, False to disable caching.
+        :param track_bank: Optional TrackBank instance or path to track bank archive. If provided, tracks are sampled
+                           from the bank instead of being generated. Ignored when track is provided. Bank opened
+                           from a path is closed by close().
+        :param camera_resolution: (width, height) of camera images
+        :param camera_channels: channels of camera images, see PovRenderer
+        :param snapshot_pool_size: maximal number of snapshots kept in memory, see snapshot()
+        """
+        self.gui = gui
+        self.sim_time_step = sim_time_step
+        self.randomize = randomize
+        self.obsv_type = obsv_type.lower()
+        self.track_render_params = track_render_params
+        self.preset_track = track
+        self.track_type = track_type.lower()
+        self.built_track = False
+        self.track_cache = get_default_track_cache() if track_cache is None else track_cache
+        # Bank opened from a path is closed with the environment, a passed instance is left to the caller
+        self._owns_track_bank = isinstance(track_bank, str)
+        if self._owns_track_bank:
+            track_bank = TrackBank(track_bank)
+        self.track_bank = track_bank
+        self.camera_resolution = tuple(camera_resolution)
+        self.camera_channels = camera_channels.lower()
+        self.snapshot_pool_size = snapshot_pool_size
+        self._snapshots = OrderedDict()
+        self._next_snapshot = 0
+
+        if self.track_type not in self.SUPPORTED_TRACK_TYPE:
+            raise ValueError("Track type '{}' not supported.".format(self.track_type))
+        if self.obsv_type not in self.SUPPORTED_OBSV_TYPE:
+            raise ValueError("Observation type '{}' not supported.".format(self.obsv_type))
+
+        self.owns_client = pb_client is None
+        if self.owns_client:
+            # Track plane files are written only by the world owner
+            self.track_dir = tempfile.TemporaryDirectory(prefix="linegym_")
+            self.pb_client: p = BulletClient(connection_mode=p.GUI if self.gui else p.DIRECT)
+            self.pb_client.setPhysicsEngineParameter(enableFileCaching=0)
+            p.resetDebugVisualizerCamera(cameraDistance=2.6, cameraYaw=45, cameraPitch=-45, cameraTargetPosition=[0, 0, 0])
+            p.configureDebugVisualizer(p.COV_ENABLE_GUI, 0)
+        else:
+            self.track_dir = None
+            self.pb_client: p = pb_client
+
+        self.np_random = None
+
+        self.track: Track = None
+        self.track_img: TrackRefImg = None
+        self.pov_renderer: PovRenderer = None
+        self.track_plane: TrackPlane = None
+        self._track_texture = None
+
+    def _reset_world(self):
+        """
+        Remove all bodies and snapshots from the pybullet world and set up the simulation again.
+        """
+        self.clear_snapshots()
+        self.pb_client.resetSimulation()
+        self.pb_client.setTimeStep(self.sim_time_step)
+        self.pb_client.setGravity(0, 0, -9.81)
+
+    def _update_track_images(self, img, border_w=0.3):
+        """
+        Build images derived from track texture that are needed by observation type. Images are rebuilt only when
+        texture changed.
+        :param img: rendered track image, as returned by _render_track()
+        :param border_w: track outside border width in meters, same as used to build track plane
+        """
+        if img is not self._track_texture:
+            # Track or track rendering changed, images derived from texture are rebuilt when needed
+            self._track_texture = img
+            self.track_img = None
+            self.pov_renderer = None
+        if self.obsv_type == "ir_array" and self.track_img is None:
+            self.track_img = self._get_track_ref_img(img, border_w)
+        if self.obsv_type == "camera_fast" and self.pov_renderer is None:
+            self.pov_renderer = self._make_pov_renderer(img, border_w)
+
+    def _render_track(self, border_w=0.3):
+        """
+        Render track image. Cached image is reused when track cache is enabled.
+        :param border_w: track outside border width in meters
+        :return: rendered track image
+        """
+        if self.track_cache:
+            return self.track_cache.get_track_image(self.track, border_w=border_w, ppm=1500)
+
+        if not self.built_track or self.track.render_params or self._track_texture is None:
+            # Render parameters may have been randomized
+            img = self.track.render(border_w=border_w, ppm=1500)
+            self.built_track = True
+        else:
+            img = self._track_texture
+        return img
+
+    def _get_track_ref_img(self, img, border_w=0.3):
+        """
+        Get IR sensor reference image of current track, memoized by track cache when enabled.
+        :param img: rendered track image, as returned by _render_track()
+        :param border_w: track outside border width in meters, same as used to build track plane
+        :return: TrackRefImg instance
+        """
+        if self.track_cache:
+            return self.track_cache.get_track_ref_img(self.track, border_w=border_w, ppm=1500,
+                                                      persist=self._track_repeats())
+        return TrackRefImg(img, 1500)
+
+    def _track_repeats(self):
+        """
+        Check if tracks of this environment are expected to be used again in later episodes.
+        :return: True for preset track, track bank or fixed seed
+        """
+        return self.preset_track is not None or self.track_bank is not None or not self.randomize
+
+    def _make_pov_renderer(self, img, border_w=0.3):
+        """
+        Create software camera renderer of current track.
+        :param img: rendered track image, as returned by _render_track()
+        :param border_w: track outside border width in meters, same as used to build track plane
+        :return: PovRenderer instance
+        """
+        plane_size = (self.track.width + 2 * border_w, self.track.height + 2 * border_w)
+        return PovRenderer(img, plane_size, resolution=self.camera_resolution, channels=self.camera_channels,
+                           fov=LineFollowerBot.CAMERA_FOV)
+
+    def _next_track(self):
+        """
+        Get track for the next episode. Preset track is reused, otherwise a new track is generated.
+        :return: Track instance
+        """
+        if self.preset_track:
+            self.preset_track.reset_progress()
+            return self.preset_track
+
+        self.built_track = False
+        if self.track_bank is not None:
+            return self.track_bank.sample(seed=None if self.randomize else 4125, nb_checkpoints=500,
+                                          render_params=self.track_render_params)
+        elif self.track_type == "simple":
+            return Track.generate(1.75, hw_ratio=0.7, seed=None if self.randomize else 4125,
+                                  spikeyness=0.3, nb_checkpoints=500, render_params=self.track_render_params)
+        elif self.track_type == "robotracer":
+            return Track.generate_robotracer(1.75, seed=None if self.randomize else 4125,
+                                             nb_checkpoints=500, render_params=self.track_render_params)
+
+    def snapshot(self):
+        """
+        Save state of simulation and environment in memory, to continue the episode from this state later with
+        restore(). Least recently used snapshots are evicted when there are more than snapshot_pool_size, snapshots are
+        removed on a full reset. Random generator states (bot noise, np.random) are not saved.
+        :return: snapshot handle
+        """
+        if not self.owns_client:
+            raise RuntimeError("Environment sharing pybullet world can not be snapshot, snapshot the owner.")
+        handle = self._next_snapshot
+        self._next_snapshot += 1
+        self._snapshots[handle] = (self.pb_client.saveState(), self._get_state())
+        while len(self._snapshots) > self.snapshot_pool_size:
+            _, (state_id, _) = self._snapshots.popitem(last=False)
+            self.pb_client.removeState(state_id)
+        return handle
+
+    def restore(self, handle):
+        """
+        Restore state saved by snapshot(). Snapshot is kept and can be restored again.
+        :param handle: snapshot handle
+        :return: None
+        """
+        try:
+            state_id, state = self._snapshots[handle]
+        except KeyError:
+            raise KeyError("Snapshot {} does not exist or was evicted.".format(handle))
+        self._snapshots.move_to_end(handle)
+        self.pb_client.restoreState(state_id)
+        self._set_state(state)
+
+    def clear_snapshots(self):
+        """
+        Remove all snapshots.
+        """
+        for state_id, _ in self._snapshots.values():
+            self.pb_client.removeState(state_id)
+        self._snapshots.clear()
+
+    def _get_state(self):
+        """
+        Get Python side state of episode, see snapshot().
+        :return: state
+        """
+        raise NotImplementedError
+
+    def _set_state(self, state):
+        """
+        Restore Python side state of episode.
+        :param state: state returned by _get_state()
+        """
+        raise NotImplementedError
+
+    def close(self):
+        if self.track_dir is not None:
+            self.track_dir.cleanup()
+        if self._owns_track_bank:
+            self.track_bank.close()
+
+    def seed(self, seed=None):
+        self.np_random, seed = seeding.np_random(seed)
+        return [seed]
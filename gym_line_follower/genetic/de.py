@@ -15,14 +15,33 @@ def derangementNumba(n):
             break
     return v
 
+@jit(nopython=True)
+def seed_numba(seed):
+    """
+    Seed random generator used inside jitted functions, it is separate from np.random
+    :param seed: Integer seed in range [0, 2**32)
+    """
+    np.random.seed(seed)
+
 #Diferential Evolution
-def diff_evolution(fobj,obj, bounds, mut=0.8, crossp=0.7, popsize=20, its=100, stopf=None, bar=False):
+def diff_evolution(fobj,obj, bounds, mut=0.8, crossp=0.7, popsize=20, its=100, stopf=None, bar=False, batch=False):
+    """
+    Minimize fobj with differential evolution
+    :param fobj: Fitness function fobj(individual, obj), or fobj(population, obj) returning fitness array if batch
+    :param obj: Object passed to fobj
+    :param bounds: List of (min, max) bounds of each parameter
+    :param batch: True if fobj evaluates the whole population in one call
+    :return: Best individual and its fitness
+    """
     ind_size=len(bounds)
     pop = np.random.rand(popsize, ind_size)
     min_b, max_b = np.asarray(bounds).T
     diff = np.fabs(min_b - max_b)
     pop_denorm = min_b + pop * diff
-    Pfitness = np.asarray([fobj(ind,obj) for ind in pop_denorm])
+    if batch:
+        Pfitness = np.asarray(fobj(pop_denorm,obj))
+    else:
+        Pfitness = np.asarray([fobj(ind,obj) for ind in pop_denorm])
     best_idx = np.argmin(Pfitness)
     best = pop_denorm[best_idx]
     for i in tqdm(range(its),disable=(not bar),leave=False,unit=" gen",file=sys.stdout):
@@ -39,9 +58,12 @@ def diff_evolution(fobj,obj, bounds, mut=0.8, crossp=0.7, popsize=20, its=100, s
         trial=np.where(cross_points,mut,pop)
         #Probar nuevo fitness
         trial_denorm=min_b + trial * diff
-        fitnessT=np.zeros(popsize)
-        for j in range(popsize):
-            fitnessT[j]=fobj(trial_denorm[j],obj)
+        if batch:
+            fitnessT=np.asarray(fobj(trial_denorm,obj))
+        else:
+            fitnessT=np.zeros(popsize)
+            for j in range(popsize):
+                fitnessT[j]=fobj(trial_denorm[j],obj)
         #Actualizar generacion
         test=fitnessT<Pfitness
         Pfitness=np.where(test,fitnessT,Pfitness)
@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 import numpy as np
-from gym_line_follower.trackutils import collision_dect,get_curve,get_rect
+from gym_line_follower.trackutils import get_curve,get_rect
+from gym_line_follower.trackutils import curves_fitness_batch as _curves_fitness_batch
     
 def curves_fitness(curves,track_obj):
     """
@@ -8,46 +9,51 @@ def curves_fitness(curves,track_obj):
 
     Params:
     curves - Solution to test [ds1,da1,ds2,da2,ds3,da3]
-    track_obj - state of the track, dictionary with points, start point and end point
+    track_obj - state of the track, dictionary with CollisionGrid of track points, start point and end point.
+                Solution points are added to the grid during evaluation and removed at the end.
     """
     start=track_obj["start"] #(x1,y1,ang1)
     end=track_obj["end"] ##(x2,y2,ang2)
     curve_r=curves.reshape((-1,2))
-    test_track=track_obj["track"]
+    test_track=track_obj["grid"]
+    track_size=test_track.size()
     n=curve_r.shape[0]-1
     x=start[0]
     y=start[1]
     cAng=start[2]
     # Calculate end points
     fit=0
-    for i,c in enumerate(curve_r):
-        ds,cur = c
-        da=cur*ds if np.abs(cur) >= 0.00025 else 0
-        if da == 0:#rect
-            #Collision
-            rect=get_rect(x,y,cAng,ds,pd=50)
-            if i == n:
-                if collision_dect(rect[:-1],test_track,th=90):
-                    fit+= 10000
+    try:
+        for i,c in enumerate(curve_r):
+            ds,cur = c
+            da=cur*ds if np.abs(cur) >= 0.00025 else 0
+            if da == 0:#rect
+                #Collision
+                rect=get_rect(x,y,cAng,ds,pd=50)
+                if i == n:
+                    if test_track.collides(rect[:-1],th=90):
+                        fit+= 10000
+                else:
+                    if test_track.collides(rect[:-1],th=100):
+                        fit+= 10000
+                x=rect[-1][0]
+                y=rect[-1][1]
+                test_track.insert(rect)
             else:
-                if collision_dect(rect[:-1],test_track,th=100):
-                    fit+= 10000
-            x=rect[-1][0]
-            y=rect[-1][1]
-            test_track=np.concatenate((test_track, rect), axis=0)
-        else:
-            curve=get_curve(x,y,cAng,da,ds,pd=50)
-            if i == n:
-                if collision_dect(curve[:-1],test_track,th=90):
-                    fit+= 10000
-            else:
-                if collision_dect(curve,test_track,th=100):
-                    fit+= 10000
-            x=curve[-1][0]
-            y=curve[-1][1]
-            test_track=np.concatenate((test_track, curve), axis=0)
-            cAng+=da
-            cAng=np.arctan2(np.sin(cAng),np.cos(cAng))
+                curve=get_curve(x,y,cAng,da,ds,pd=50)
+                if i == n:
+                    if test_track.collides(curve[:-1],th=90):
+                        fit+= 10000
+                else:
+                    if test_track.collides(curve,th=100):
+                        fit+= 10000
+                x=curve[-1][0]
+                y=curve[-1][1]
+                test_track.insert(curve)
+                cAng+=da
+                cAng=np.arctan2(np.sin(cAng),np.cos(cAng))
+    finally:
+        test_track.truncate(track_size)
     #fitness
     pos_err=np.sqrt((end[0]-x)**2+(end[1]-y)**2)
     ang_err=np.abs(cAng-end[2])
@@ -55,3 +61,15 @@ def curves_fitness(curves,track_obj):
     if np.isnan(fit):#TODO: fix invalid curve
         return 40000
     return fit
+
+def curves_fitness_batch(population,track_obj):
+    """
+    Fitness of a whole population, evaluated in native code. Same values as curves_fitness for each individual.
+
+    Params:
+    population - Solutions array shape (popsize, 2*n)
+    track_obj - state of the track, see curves_fitness. Optional key "num_threads" sets the number of threads
+                used for evaluation, 0 for all hardware threads.
+    """
+    return _curves_fitness_batch(population,track_obj["grid"],track_obj["start"],track_obj["end"],
+                                 num_threads=track_obj.get("num_threads",1))
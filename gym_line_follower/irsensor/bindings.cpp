@@ -7,7 +7,19 @@ namespace py = pybind11;
 PYBIND11_MODULE(irsensor, m) {
     m.doc() = "gym_line_follower irsensor simulation"; // optional module docstring
 
+    py::class_<TrackImage, std::shared_ptr<TrackImage>>(m, "TrackImage")
+            .def(py::init<py::array_t<uint32_t, py::array::c_style>>(), py::arg("sat"))
+            .def_static("from_image", &TrackImage::from_image, py::arg("img"))
+            .def_property_readonly("sat", &TrackImage::get_sat)
+            .def_property_readonly("width", &TrackImage::width)
+            .def_property_readonly("heigth", &TrackImage::heigth);
+
     py::class_<IrSensor>(m, "IrSensor")
+            .def(py::init<std::shared_ptr<TrackImage>,
+                 int, double, double,int, double, double, double>(),
+                 py::arg("track"),py::arg("track_ppm"),py::arg("ds"),py::arg("photo_heigth"),
+                 py::arg("array_size"),py::arg("photo_sep"),py::arg("photo_fov"),
+                 py::arg("base_noise")= 0.0)
             .def(py::init<py::array_t<uint8_t, py::array::c_style | py::array::forcecast>,
                  int, double, double,int, double, double, double>(),
                  py::arg("img"),py::arg("track_ppm"),py::arg("ds"),py::arg("photo_heigth"),
@@ -15,5 +27,7 @@ PYBIND11_MODULE(irsensor, m) {
                  py::arg("base_noise")= 0.0)
             .def("update", &IrSensor::update, py::arg("x"),py::arg("y"),py::arg("ang"))
             .def("read", &IrSensor::read)
-            .def("get_photo_pos", &IrSensor::get_photo_pos);
+            .def("read_batch", &IrSensor::read_batch, py::arg("xs"),py::arg("ys"),py::arg("yaws"))
+            .def("get_photo_pos", &IrSensor::get_photo_pos)
+            .def("get_sen_radius", &IrSensor::get_sen_radius);
 }
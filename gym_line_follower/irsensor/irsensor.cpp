@@ -1,5 +1,6 @@
 #include "irsensor.hpp"
 #include <cmath>
+#include <algorithm>
 
 /*! Transform from degrees to radians
     \param deg  angle in degrees
@@ -21,25 +22,72 @@ double clamp(double x, double min, double max)
     return x;
 }
 
+TrackImage::TrackImage(py::array_t<uint32_t, py::array::c_style> sat) : m_sat(sat){
+    if (m_sat.ndim() != 2 || m_sat.shape(0) < 1 || m_sat.shape(1) < 1)
+        throw std::runtime_error("Incompatible summed-area table dimension!");
+    m_data = m_sat.data();
+    m_heigth = m_sat.shape(0)-1;
+    m_width = m_sat.shape(1)-1;
+}
+
+std::shared_ptr<TrackImage> TrackImage::from_image(py::array_t<uint8_t, py::array::c_style | py::array::forcecast> img){
+    py::buffer_info buf_info = img.request();
+    if (buf_info.ndim != 2)
+        throw std::runtime_error("Incompatible image dimension!");
+    const uint8_t *buf_ptr = (const uint8_t *) buf_info.ptr;
+    int heigth = buf_info.shape[0];
+    int width = buf_info.shape[1];
+    py::array_t<uint32_t> sat({py::ssize_t(heigth+1), py::ssize_t(width+1)});
+    uint32_t *sat_ptr = sat.mutable_data();
+    {
+        py::gil_scoped_release release;
+        int sat_width = width+1;
+        std::fill(sat_ptr, sat_ptr+sat_width, 0);
+        for (int y = 0; y < heigth; ++y) {
+            uint32_t row_sum = 0;
+            const uint32_t *prev = sat_ptr+size_t(y)*sat_width;
+            uint32_t *cur = sat_ptr+size_t(y+1)*sat_width;
+            cur[0] = 0;
+            for (int x = 0; x < width; ++x) {
+                row_sum += buf_ptr[size_t(y)*width+x];
+                cur[x+1] = prev[x+1]+row_sum;
+            }
+        }
+    }
+    return std::make_shared<TrackImage>(sat);
+}
+
 IrSensor::IrSensor(py::array_t<uint8_t, py::array::c_style | py::array::forcecast> img,
                    int track_ppm, double ds, double photo_heigth,
                    int array_size, double photo_sep, double photo_fov, double base_noise)
-    :m_gen((std::random_device())()), m_dis(0,base_noise){
+    :IrSensor(TrackImage::from_image(img), track_ppm, ds, photo_heigth, array_size, photo_sep, photo_fov, base_noise){
+}
+
+IrSensor::IrSensor(std::shared_ptr<TrackImage> track, int track_ppm, double ds, double photo_heigth,
+                   int array_size, double photo_sep, double photo_fov, double base_noise)
+    :m_track(track), m_gen((std::random_device())()), m_dis(0,base_noise){
     m_ds = ds;
     m_array_size = array_size;
     m_radius = int(photo_heigth*tan(d2r(photo_fov)/2)*track_ppm);
     m_photo_sep = photo_sep;
     m_track_ppm = track_ppm;
-    //Copy track
-    py::buffer_info buf_info = img.request();
-    if (buf_info.ndim != 2)
-        throw std::runtime_error("Incompatible image dimension!");
-    uint8_t *buf_ptr = (uint8_t *) buf_info.ptr;
-    m_track_heigth=buf_info.shape[0];
-    m_track_width=buf_info.shape[1];
-    track = std::make_unique<uint8_t[]>(buf_info.size);
-    for (int i = 0; i < buf_info.size; ++i) {
-        track[i] = buf_ptr[i];
+    m_track_heigth = m_track->heigth();
+    m_track_width = m_track->width();
+    //Pixels inside the sensor disk (x*x + y*y < r*r) as rectangles of rows with equal width
+    m_disk_area = 0;
+    for (int y_offset = -m_radius+1; y_offset < m_radius; ++y_offset) {
+        int half = int(std::sqrt(double(m_radius*m_radius - y_offset*y_offset)));
+        while (half*half + y_offset*y_offset >= m_radius*m_radius) half--;
+        while ((half+1)*(half+1) + y_offset*y_offset < m_radius*m_radius) half++;
+        if (!m_disk.empty() && m_disk.back().x1 == half)
+            m_disk.back().y1 = y_offset;
+        else
+            m_disk.push_back(irect(-half,y_offset,half,y_offset));
+        m_disk_area += 2*half+1;
+    }
+    if (m_disk.empty()) { //Sensor smaller than a pixel
+        m_disk.push_back(irect(0,0,0,0));
+        m_disk_area = 1;
     }
     photo_pos = std::make_unique<ipoint[]>(array_size);
     srand (static_cast <unsigned> (time(0)));
@@ -51,15 +99,35 @@ ipoint IrSensor::to_pixel(dpoint p){
     return ipoint(px,py);
 }
 
-void IrSensor::update(double x, double y, double yaw){
+void IrSensor::photo_positions(double x, double y, double yaw, ipoint *out){
     dpoint pos = dpoint(x+m_ds*cos(yaw),y+m_ds*sin(yaw)) +
             dpoint(-m_photo_sep*sin(yaw),m_photo_sep*cos(yaw))*((m_array_size-1)/2.0);
     dpoint dif = dpoint(m_photo_sep*sin(yaw),-m_photo_sep*cos(yaw));
     for (int i = 0; i < m_array_size; ++i) {
-        ipoint sen_pos = to_pixel(pos + dif*double(i));
-        photo_pos[i].x=sen_pos.x;
-        photo_pos[i].y=sen_pos.y;
+        out[i] = to_pixel(pos + dif*double(i));
+    }
+}
+
+void IrSensor::update(double x, double y, double yaw){
+    photo_positions(x, y, yaw, photo_pos.get());
+}
+
+double IrSensor::disk_sum(ipoint p){
+    uint32_t sum = 0;
+    for (const irect &r : m_disk) {
+        //Clip to image, out of bounds area is white (0)
+        int x0 = std::max(p.x+r.x0, 0);
+        int y0 = std::max(p.y+r.y0, 0);
+        int x1 = std::min(p.x+r.x1, m_track_width-1);
+        int y1 = std::min(p.y+r.y1, m_track_heigth-1);
+        if (x0 > x1 || y0 > y1) continue;
+        sum += m_track->rect_sum(x0, y0, x1, y1);
     }
+    return double(sum);
+}
+
+double IrSensor::reading(ipoint p){
+    return clamp(std::round((1.0/255.0)*disk_sum(p)/m_disk_area)+m_dis(m_gen),0.0,1.0);
 }
 
 py::array_t<double> IrSensor::read(){
@@ -67,24 +135,29 @@ py::array_t<double> IrSensor::read(){
     py::buffer_info buf = sen.request();
     double *ptr = (double *) buf.ptr;
     for (int i = 0; i < m_array_size; ++i) {
-        double sum = 0;
-        int n = 0;
-        for (int y_offset = -m_radius; y_offset <= m_radius; ++y_offset) {
-            for (int x_offset = -m_radius; x_offset <= m_radius; ++x_offset) {
-                if ((x_offset*x_offset + y_offset*y_offset)<(m_radius*m_radius)) {
-                    int x=photo_pos[i].x+x_offset;
-                    int y=photo_pos[i].y+y_offset;
-                    if (x<m_track_width && y<m_track_heigth) {
-                        sum+=double(track[x+m_track_width*y]);
-                    }
-                    else { //White color in out of bounds area
-                        sum+=double(0);
-                    }
-                    n++;
-                }
-            }
+        ptr[i] = reading(photo_pos[i]);
+    }
+    return sen;
+}
+
+py::array_t<double> IrSensor::read_batch(py::array_t<double, py::array::c_style | py::array::forcecast> xs,
+                                         py::array_t<double, py::array::c_style | py::array::forcecast> ys,
+                                         py::array_t<double, py::array::c_style | py::array::forcecast> yaws){
+    py::buffer_info x_buf = xs.request(), y_buf = ys.request(), yaw_buf = yaws.request();
+    if (x_buf.size != y_buf.size || x_buf.size != yaw_buf.size)
+        throw std::runtime_error("xs, ys and yaws must have the same size!");
+    const double *x_ptr = (double *) x_buf.ptr;
+    const double *y_ptr = (double *) y_buf.ptr;
+    const double *yaw_ptr = (double *) yaw_buf.ptr;
+    py::ssize_t n = x_buf.size;
+    py::array_t<double> sen({n, py::ssize_t(m_array_size)});
+    double *ptr = (double *) sen.request().ptr;
+    std::vector<ipoint> pos(m_array_size);
+    for (py::ssize_t j = 0; j < n; ++j) {
+        photo_positions(x_ptr[j], y_ptr[j], yaw_ptr[j], pos.data());
+        for (int i = 0; i < m_array_size; ++i) {
+            ptr[j*m_array_size+i] = reading(pos[i]);
         }
-        ptr[i] = clamp(std::round((1.0/255.0)*sum/n)+m_dis(m_gen),0.0,1.0);
     }
     return sen;
 }
@@ -6,6 +6,8 @@
 #include <math.h>
 #include <stdint.h>
 #include <random>
+#include <vector>
+#include <memory>
 
 namespace py = pybind11;
 
@@ -23,11 +25,65 @@ struct point {
 typedef point<double> dpoint;
 typedef point<int> ipoint;
 
+//Axis aligned rectangle of pixel offsets, bounds are inclusive
+struct irect {
+  int x0,y0,x1,y1;
+  irect(int a_x0,int a_y0,int a_x1,int a_y1): x0(a_x0), y0(a_y0), x1(a_x1), y1(a_y1) {}
+} ;
+
+//Summed-area table of a track image, can be shared by many sensors
+class TrackImage
+{
+public:
+    /*! Constructor, table is referenced and not copied
+        \param sat  Summed-area table, uint32 array shape (heigth+1, width+1). Can be a read-only or memory-mapped
+                    array, it is kept alive while the TrackImage exists.
+    */
+    TrackImage(py::array_t<uint32_t, py::array::c_style> sat);
+
+    /*! Build summed-area table of an image
+        \param img  Image of the track
+    */
+    static std::shared_ptr<TrackImage> from_image(py::array_t<uint8_t, py::array::c_style | py::array::forcecast> img);
+
+    //Sum of pixel values in rectangle, bounds are inclusive and must be inside the image
+    inline uint32_t rect_sum(int x0, int y0, int x1, int y1) const {
+        const uint32_t *top = m_data + size_t(y0)*(m_width+1);
+        const uint32_t *bottom = m_data + size_t(y1+1)*(m_width+1);
+        return bottom[x1+1] - bottom[x0] - top[x1+1] + top[x0];
+    }
+
+    int width() const { return m_width; }
+    int heigth() const { return m_heigth; }
+    py::array_t<uint32_t> get_sat() const { return m_sat; }
+
+private:
+    //Sums wrap around in uint32, but differences of sums are exact as long as the summed rectangle is smaller
+    //than 2^32/255 pixels.
+    py::array_t<uint32_t> m_sat;
+    const uint32_t *m_data;
+    int m_width;
+    int m_heigth;
+};
+
 //Simulated IR sensor class
 class IrSensor
 {
 public:
     /*! Constuctor
+        \param track Summed-area table of the track, shared with other sensors
+        \param track_ppm  PPM of the track image
+        \param ds  Distance from robot center to sensor array center
+        \param photo_heigth  Distance in [m] from the floor to the ir sensor
+        \param array_size Number of sensors in the array
+        \param photo_sep  Separation in [m] between sensors of the array
+        \param photo_fov Field of view of the sensors
+        \param base_noise  Noise to be added to the sensor reading, stddev of normal dist.
+    */
+    IrSensor(std::shared_ptr<TrackImage> track, int track_ppm, double ds, double photo_heigth, int array_size,
+             double photo_sep, double photo_fov, double base_noise=0.0);
+
+    /*! Constuctor, builds a private summed-area table of the image
         \param img Image of the track
         \param track_ppm  PPM of the track image
         \param ds  Distance from robot center to sensor array center
@@ -51,6 +107,16 @@ public:
     //Get the reading of each sensor in the array
     py::array_t<double> read();
 
+    /*! Get the readings for many robot poses, sensor position set by update() is not changed
+        \param xs  x[m] positions of robot
+        \param ys  y[m] positions of robot
+        \param yaws  yaw angles[rad] of robot
+        \return readings array shape (n, array_size)
+    */
+    py::array_t<double> read_batch(py::array_t<double, py::array::c_style | py::array::forcecast> xs,
+                                   py::array_t<double, py::array::c_style | py::array::forcecast> ys,
+                                   py::array_t<double, py::array::c_style | py::array::forcecast> yaws);
+
     //Get the position[pixel] of each sensor of the array i the track image
     py::array_t<int> get_photo_pos();
 
@@ -58,7 +124,10 @@ public:
     int get_sen_radius();
 
 private:
-    std::unique_ptr<uint8_t[]> track;
+    std::shared_ptr<TrackImage> m_track;
+    //Sensor disk decomposed to rectangles
+    std::vector<irect> m_disk;
+    int m_disk_area;
     int m_track_ppm;
     std::unique_ptr<ipoint[]> photo_pos;
     int m_track_width;
@@ -75,6 +144,15 @@ private:
     //converts position in the track to position in the track image
     ipoint to_pixel(dpoint p);
 
+    //positions[pixel] of sensors for a robot pose
+    void photo_positions(double x, double y, double yaw, ipoint *out);
+
+    //sum of pixel values under the sensor disk, out of bounds pixels are 0
+    double disk_sum(ipoint p);
+
+    //noisy reading of a sensor
+    double reading(ipoint p);
+
 
 };
 
@@ -1,14 +1,16 @@
 import os
+import copy
 
 import numpy as np
 import pybullet as p
 
 from .reference_geometry import CameraWindow, ReferencePoint
-from .line_interpolation import sort_points, interpolate_points
+from .line_interpolation import sort_points_by_index, interpolate_points
 from .dc_motor import DCMotor
 from .track import Track
 from .irsensor import IrSensor
 from .utils import TrackRefImg
+from .pov_renderer import CameraBuffer
 
 JOINT_INDICES = {"left_wheel": 1,
                  "right_wheel": 2}
@@ -20,9 +22,16 @@ class LineFollowerBot:
     """
     Class simulating a line following bot with differential steering.
     """
-    SUPPORTED_OBSV_TYPE = ["points_visible", "points_latch", "points_latch_bool", "camera", "ir_array"]
-
-    def __init__(self, pb_client, nb_cam_points, start_xy, start_yaw, config, obsv_type="visible", track_img=None):
+    SUPPORTED_OBSV_TYPE = ["points_visible", "points_latch", "points_latch_bool", "camera", "camera_fast", "ir_array"]
+    # Length of track in meters on each side of the bot that is searched for visible points. Must cover the camera
+    # window even where the track turns back towards itself.
+    VISIBILITY_SPAN = 1.0
+    # POV camera height in meters and vertical field of view in degrees
+    CAMERA_HEIGHT = 0.095
+    CAMERA_FOV = 49
+
+    def __init__(self, pb_client, nb_cam_points, start_xy, start_yaw, config, obsv_type="visible", track_img=None,
+                 origin=(0., 0.), pov_renderer=None, camera_buffer=None, camera_frame_skip=1):
         """
         Initialize bot.
         :param pb_client: pybullet client for simulation interfacing
@@ -37,12 +46,22 @@ class LineFollowerBot:
                             "points_latch" - returns array length nb_cam_points if at least 2 line points are visible in
                                 camera window, returns empty array otherwise
                             "points_latch_bool" - same as "latch", se LineFollowerEnv implementation
-                            "camera" - return (240, 320, 3) camera image RGB array
+                            "camera" - return camera image rendered by pybullet, see camera_buffer
+                            "camera_fast" - return camera image rendered by pov_renderer from track image
                             "ir_array" - return array of lenght irsensor_array_number with the ir line sensor readings
         :param track_img: Grayscale image of the track for irsensor.
+        :param origin: world position (x, y) of the track origin. Bot position is always reported relative to the
+                       track, origin only shifts the body in the pybullet world.
+        :param pov_renderer: PovRenderer of the track, required for "camera_fast" observation.
+        :param camera_buffer: CameraBuffer camera observations are rendered into, determines image resolution, channels
+                              and dtype. If None, buffer for (240, 320, 3) RGB images is allocated.
+        :param camera_frame_skip: render new camera observation every camera_frame_skip steps, previous image is
+                                  returned in between
         """
         self.local_dir = os.path.dirname(__file__)
         self.config = config
+        self.origin = origin
+        self.pov_renderer = pov_renderer
 
         self.pb_client: p = pb_client
         self.bot = None
@@ -72,27 +91,42 @@ class LineFollowerBot:
         if self.obsv_type=="ir_array":
             if not isinstance(track_img, TrackRefImg):
                 raise TypeError("track_img must be an TrackImg")
-            sen_heigth = self.config["irsensor_position_heigth"]
-            sen_dx=self.config["irsensor_position_point_x"]
-            sen_num=self.config["irsensor_array_number"]
-            sen_photo_sep=self.config["irsensor_photo_separation"]
-            sen_photo_fov=self.config["irsensor_photo_fov"]
-            track_ppm = track_img.ppm
-            img = track_img.img
-            base_noise = self.config["irsensor_noise"]
-            self.irsensor=IrSensor(img,track_ppm,sen_dx,sen_heigth,sen_num,sen_photo_sep,sen_photo_fov,base_noise)
+            self.track_img = track_img
+            self.irsensor = None
+        elif self.obsv_type == "camera_fast" and pov_renderer is None:
+            raise TypeError("pov_renderer must be provided for 'camera_fast' observation")
+        if camera_buffer is None and self.obsv_type == "camera_fast":
+            camera_buffer = CameraBuffer(pov_renderer.resolution, pov_renderer.channels)
+        elif camera_buffer is None and self.obsv_type == "camera":
+            camera_buffer = CameraBuffer()
+        self.camera_buffer = camera_buffer
+        self.camera_frame_skip = camera_frame_skip
+        self._frame_counter = 0
         self.reset(start_xy, start_yaw)
 
     def reset(self, xy, yaw):
         """
-        Reload bot urdf, reposition bot, reinitialize camera window and other stuff.
+        Load bot urdf or reposition already loaded bot, reinitialize camera window and other stuff.
         :param xy: starting xy coords
         :param yaw: starting yaw
         :return: None
         """
-        self.bot = self.pb_client.loadURDF(os.path.join(self.local_dir, "follower_bot.urdf"), basePosition=[*xy, 0.0],
-                                           baseOrientation=self.pb_client.getQuaternionFromEuler([0., 0., yaw]))
+        base_position = [xy[0] + self.origin[0], xy[1] + self.origin[1], 0.0]
+        base_orientation = self.pb_client.getQuaternionFromEuler([0., 0., yaw])
+        if self.bot is None:
+            self.bot = self.pb_client.loadURDF(os.path.join(self.local_dir, "follower_bot.urdf"),
+                                               basePosition=base_position, baseOrientation=base_orientation)
+        else:
+            # Warm reset, bot body stays loaded and is moved to start pose at rest
+            self.pb_client.resetBasePositionAndOrientation(self.bot, base_position, base_orientation)
+            self.pb_client.resetBaseVelocity(self.bot, [0., 0., 0.], [0., 0., 0.])
+            for joint in range(self.pb_client.getNumJoints(self.bot)):
+                self.pb_client.resetJointState(self.bot, joint, 0., 0.)
+        self.prev_pos = ((0., 0.), 0.)
         self.pos = xy, yaw
+        self.prev_vel = ((0., 0.), 0.)
+        self.vel = ((0., 0.), 0.)
+        self._frame_counter = 0
 
         h = self.config["camera_window_height"]
         wt = self.config["camera_window_top_width"]
@@ -116,6 +150,16 @@ class LineFollowerBot:
         self.cam_pos_point.move(xy, yaw)
 
         if self.obsv_type=="ir_array":
+            sen_heigth = self.config["irsensor_position_heigth"]
+            sen_dx=self.config["irsensor_position_point_x"]
+            sen_num=self.config["irsensor_array_number"]
+            sen_photo_sep=self.config["irsensor_photo_separation"]
+            sen_photo_fov=self.config["irsensor_photo_fov"]
+            track_ppm = self.track_img.ppm
+            base_noise = self.config["irsensor_noise"]
+            # Summed-area table is shared with other sensors on the same track image, not copied
+            self.irsensor=IrSensor(self.track_img.track_image,track_ppm,sen_dx,sen_heigth,sen_num,sen_photo_sep,
+                                   sen_photo_fov,base_noise)
             self.irsensor.update(xy[0],xy[1],yaw)
 
         nom_volt = self.config["motor_nominal_voltage"]
@@ -126,18 +170,74 @@ class LineFollowerBot:
 
         self.volts = self.config["volts"]
 
+        # Actuation parameters of both wheels for apply_action()
+        self._wheel_joints = [JOINT_INDICES["left_wheel"], JOINT_INDICES["right_wheel"]]
+        self._motor_directions = np.array([MOTOR_DIRECTIONS["left"], MOTOR_DIRECTIONS["right"]], dtype=np.float64)
+        self._motor_constants = np.array([self.left_motor.constant, self.right_motor.constant])
+        self._motor_resistances = np.array([self.left_motor.resistance, self.right_motor.resistance])
+        # Bound functions, BulletClient creates a new partial on every attribute access
+        self._get_joint_states = self.pb_client.getJointStates
+        self._set_joint_motor_control_array = self.pb_client.setJointMotorControlArray
+        self._torque_control = self.pb_client.TORQUE_CONTROL
+
         # Disable joint motors prior to using torque control
         self.pb_client.setJointMotorControl2(bodyIndex=self.bot, jointIndex=JOINT_INDICES["left_wheel"],
                                              controlMode=self.pb_client.VELOCITY_CONTROL, force=0)
         self.pb_client.setJointMotorControl2(bodyIndex=self.bot, jointIndex=JOINT_INDICES["right_wheel"],
                                              controlMode=self.pb_client.VELOCITY_CONTROL, force=0)
 
+    def get_state(self):
+        """
+        Get Python side state of the bot, pybullet body state is not included. See set_state().
+        :return: state dict
+        """
+        state = {"pos": self.pos,
+                 "prev_pos": self.prev_pos,
+                 "vel": self.vel,
+                 "prev_vel": self.prev_vel,
+                 "left_motor": copy.copy(self.left_motor),
+                 "right_motor": copy.copy(self.right_motor),
+                 "volts": self.volts,
+                 "frame_counter": self._frame_counter}
+        if self.camera_buffer is not None:
+            state["camera_frame"] = self.camera_buffer.frame.copy()
+            state["camera_image"] = self.camera_buffer.image.copy()
+        return state
+
+    def set_state(self, state):
+        """
+        Restore Python side state of the bot and move reference geometry to restored position.
+        :param state: state dict returned by get_state()
+        :return: None
+        """
+        self.pos = state["pos"]
+        self.prev_pos = state["prev_pos"]
+        self.vel = state["vel"]
+        self.prev_vel = state["prev_vel"]
+        self.left_motor = copy.copy(state["left_motor"])
+        self.right_motor = copy.copy(state["right_motor"])
+        self._motor_constants = np.array([self.left_motor.constant, self.right_motor.constant])
+        self._motor_resistances = np.array([self.left_motor.resistance, self.right_motor.resistance])
+        self.volts = state["volts"]
+        self._frame_counter = state["frame_counter"]
+        if self.camera_buffer is not None:
+            np.copyto(self.camera_buffer.frame, state["camera_frame"])
+            np.copyto(self.camera_buffer.image, state["camera_image"])
+
+        xy, yaw = self.pos
+        self.cam_window.move(xy, yaw)
+        self.track_ref_point.move(xy, yaw)
+        self.cam_target_point.move(xy, yaw)
+        self.cam_pos_point.move(xy, yaw)
+        if self.obsv_type == "ir_array":
+            self.irsensor.update(xy[0], xy[1], yaw)
+
     def get_position(self):
         position, orientation = self.pb_client.getBasePositionAndOrientation(self.bot)
         x, y, z = position
         orientation = self.pb_client.getEulerFromQuaternion(orientation)
         pitch, roll, yaw = orientation
-        return (x, y), yaw
+        return (x - self.origin[0], y - self.origin[1]), yaw
 
     def _update_position_velocity(self):
         new_xy, new_yaw = self.get_position()
@@ -173,18 +273,25 @@ class LineFollowerBot:
         """
         self._update_position_velocity()
 
-        if self.obsv_type == "camera":
-            return self.get_pov_image()
+        if self.obsv_type in ["camera", "camera_fast"]:
+            if self._frame_counter % self.camera_frame_skip == 0:
+                if self.obsv_type == "camera":
+                    self.get_pov_image(self.camera_buffer)
+                else:
+                    self.get_fast_pov_image(self.camera_buffer)
+            self._frame_counter += 1
+            return self.camera_buffer.image
 
         elif self.obsv_type == "ir_array":
             return self.irsensor.read()
 
-        visible_pts = self.cam_window.visible_points(track.mpt)
+        visible_pts_local, visible_idx = self._visible_track_points(track)
+        nb_track_pts = len(track.pts)
 
         if self.obsv_type == "points_visible":
-            if len(visible_pts) > 0:
-                pts = self.cam_window.convert_points_to_local(visible_pts)
-                pts = sort_points(pts, origin=self.track_ref_point.get_xy())
+            if len(visible_pts_local) > 0:
+                pts = sort_points_by_index(visible_pts_local, visible_idx, nb_track_pts,
+                                           origin=self.track_ref_point.get_xy())
                 pts = interpolate_points(pts, segment_length=0.025)
             else:
                 pts = np.zeros((0, 2))
@@ -204,9 +311,8 @@ class LineFollowerBot:
             return observation
 
         elif self.obsv_type in ["points_latch", "points_latch_bool"]:
-            if len(visible_pts) > 0:
-                visible_pts_local = self.cam_window.convert_points_to_local(visible_pts)
-                visible_pts_local = sort_points(visible_pts_local)
+            if len(visible_pts_local) > 0:
+                visible_pts_local = sort_points_by_index(visible_pts_local, visible_idx, nb_track_pts)
                 visible_pts_local = interpolate_points(visible_pts_local, self.nb_cam_pts)
                 if len(visible_pts_local) > 1:
                     observation = visible_pts_local.flatten().tolist()
@@ -218,68 +324,68 @@ class LineFollowerBot:
 
 
 
-    def _set_wheel_torque(self, l_torque, r_torque):
-        """
-        Apply torque to simulated wheels.
-        :param l_torque: left wheel torque in Nm
-        :param r_torque: right wheel torque in Nm
+    def _visible_track_points(self, track):
         """
-        l_torque *= MOTOR_DIRECTIONS["left"]
-        r_torque *= MOTOR_DIRECTIONS["right"]
-        self.pb_client.setJointMotorControl2(self.bot,
-                                             jointIndex=JOINT_INDICES["left_wheel"],
-                                             controlMode=self.pb_client.TORQUE_CONTROL,
-                                             force=l_torque)
-        self.pb_client.setJointMotorControl2(self.bot,
-                                             jointIndex=JOINT_INDICES["right_wheel"],
-                                             controlMode=self.pb_client.TORQUE_CONTROL,
-                                             force=r_torque)
-
-    def _power_to_volts(self, l_pow, r_pow):
-        """
-        Convert power to volts
-        :param l_pow:
-        :param r_pow:
-        :return:
+        Find track points visible in camera window. Only track points around the bot are tested, candidates are
+        selected by track order starting from the track point nearest to the bot.
+        :param track: Track object
+        :return: tuple of: visible points in local c.s. array shape (n, 2), track indices of visible points shape (n,)
         """
-        l_pow = np.clip(l_pow, -1., 1.)
-        r_pow = np.clip(r_pow, -1., 1.)
-        return l_pow * self.volts, r_pow * self.volts
+        nb_pts = int(self.VISIBILITY_SPAN / track.point_spacing)
+        near_idx = track.nearest_point_idx(self.pos[0], hint_idx=track.progress_idx)
+        candidates = track.indices_around(near_idx, nb_pts, nb_pts)
+        visible_pts, mask = self.cam_window.visible_local_points(track.pts[candidates])
+        return visible_pts, candidates[mask]
 
     def apply_action(self, action):
         """
-        Apply torque to simulated wheels.
-        :param action:
+        Apply torque to simulated wheels. Called every simulation sub-step, both wheels are handled at once with
+        cached joint indices, motor parameters and bound pybullet functions.
+        :param action: motor power [left, right], clipped to range [-1, 1]
         :return: None
         """
-        l_volts, r_volts = self._power_to_volts(*action)
-        l_vel, r_vel = self._get_wheel_velocity()
-        l_vel *= MOTOR_DIRECTIONS["left"]
-        r_vel *= MOTOR_DIRECTIONS["right"]
-        l_torque = self.left_motor.get_torque(l_volts, l_vel)
-        r_torque = self.right_motor.get_torque(r_volts, r_vel)
-        self._set_wheel_torque(l_torque, r_torque)
-
-    def get_pov_image(self):
+        volts = np.clip(action, -1., 1.) * self.volts
+        l_state, r_state = self._get_joint_states(self.bot, self._wheel_joints)
+        vel = np.array((l_state[1], r_state[1])) * self._motor_directions
+        torque = (volts - vel * self._motor_constants) / self._motor_resistances * self._motor_constants
+        self._set_joint_motor_control_array(self.bot, self._wheel_joints, self._torque_control,
+                                            forces=(torque * self._motor_directions).tolist())
+
+    def get_pov_image(self, camera_buffer=None):
         """
-        Render virtual camera image.
-        :return: RGB Array shape (240, 320, 3)
+        Render virtual camera image with pybullet.
+        :param camera_buffer: CameraBuffer to render into, if None a new buffer for (240, 320, 3) RGB image is
+                              allocated
+        :return: image array, see CameraBuffer
         """
+        if camera_buffer is None:
+            camera_buffer = CameraBuffer()
+        width, height = camera_buffer.resolution
         cam_x, cam_y = self.cam_pos_point.get_xy()
-        cam_z = 0.095
+        cam_z = self.CAMERA_HEIGHT
         target_x, target_y = self.cam_target_point.get_xy()
-        vm = self.pb_client.computeViewMatrix(cameraEyePosition=[cam_x, cam_y, cam_z],
-                                              cameraTargetPosition=[target_x, target_y, 0.0],
+        ox, oy = self.origin
+        vm = self.pb_client.computeViewMatrix(cameraEyePosition=[cam_x + ox, cam_y + oy, cam_z],
+                                              cameraTargetPosition=[target_x + ox, target_y + oy, 0.0],
                                               cameraUpVector=[0.0, 0.0, 1.0])
-        pm = self.pb_client.computeProjectionMatrixFOV(fov=49,
-                                                       aspect=320 / 240,
+        pm = self.pb_client.computeProjectionMatrixFOV(fov=self.CAMERA_FOV,
+                                                       aspect=width / height,
                                                        nearVal=0.0001,
                                                        farVal=1)
-        w, h, rgb, deth, seg = self.pb_client.getCameraImage(width=320,
-                                                             height=240,
-                                                             viewMatrix=vm,
-                                                             projectionMatrix=pm,
-                                                             renderer=p.ER_BULLET_HARDWARE_OPENGL)
-        rgb = np.array(rgb)
-        rgb = rgb[:, :, :3]
-        return rgb
+        w, h, rgba, depth, seg = self.pb_client.getCameraImage(width=width,
+                                                               height=height,
+                                                               viewMatrix=vm,
+                                                               projectionMatrix=pm,
+                                                               renderer=p.ER_BULLET_HARDWARE_OPENGL,
+                                                               flags=p.ER_NO_SEGMENTATION_MASK)
+        return camera_buffer.from_rgba(rgba)
+
+    def get_fast_pov_image(self, camera_buffer=None):
+        """
+        Render virtual camera image from track image with pov_renderer, without pybullet rendering.
+        :param camera_buffer: CameraBuffer to render into, if None a new buffer is allocated
+        :return: image array, see CameraBuffer
+        """
+        cam_x, cam_y = self.cam_pos_point.get_xy()
+        target_x, target_y = self.cam_target_point.get_xy()
+        return self.pov_renderer.render((cam_x, cam_y, self.CAMERA_HEIGHT), (target_x, target_y, 0.), camera_buffer)
@@ -1,5 +1,5 @@
 import numpy as np
-from shapely.geometry import LineString
+from scipy.spatial import cKDTree
 
 
 def interpolate_points(points, nb_out_points=None, segment_length=None):
@@ -24,8 +24,9 @@ def interpolate_points(points, nb_out_points=None, segment_length=None):
         raise ValueError("Point array is empty! Nothing to interpolate.")
     if len(points) < 2:
         return np.array([points[0]])
-    line = LineString(points)
-    length = line.length
+    points = np.asarray(points, dtype=np.float64)
+    cum_length = cumulative_length(points)
+    length = cum_length[-1]
 
     if bool(nr_segments) and not bool(segment_length):
         segment_length = length / nr_segments
@@ -34,15 +35,61 @@ def interpolate_points(points, nb_out_points=None, segment_length=None):
     else:
         raise ValueError("Exactly one out of nr_segments and interval must not be None.")
 
-    new_points = []
-    for i in range(nr_segments + 1):
-        pt_length = i * segment_length
-        if pt_length > length + 1e-6:
-            break
-        pt = line.interpolate(i*segment_length)
-        new_points.append(pt.coords[0])
-    new_points = np.array(new_points)
-    return new_points
+    pt_lengths = np.arange(nr_segments + 1) * segment_length
+    pt_lengths = np.minimum(pt_lengths[pt_lengths <= length + 1e-6], length)
+    return np.stack((np.interp(pt_lengths, cum_length, points[:, 0]),
+                     np.interp(pt_lengths, cum_length, points[:, 1])), axis=-1)
+
+
+def interpolate_points_batch(polylines, nb_out_points):
+    """
+    Interpolate points in equal intervals over many line strings at once, see interpolate_points().
+    :param polylines: list of input point arrays shape (n_i, 2) or array shape (m, n, 2). Every line string must have
+                      at least one point.
+    :param nb_out_points: desired number of interpolated points per line string
+    :return: array of interpolated points shape (m, nb_out_points, 2)
+    """
+    if nb_out_points < 1:
+        raise ValueError("nb_out_points must be grater than 0")
+    polylines = [np.asarray(pl, dtype=np.float64).reshape((-1, 2)) for pl in polylines]
+    if len(polylines) == 0:
+        return np.zeros((0, nb_out_points, 2))
+    sizes = np.array([len(pl) for pl in polylines])
+    if np.any(sizes == 0):
+        raise ValueError("Point array is empty! Nothing to interpolate.")
+
+    # Concatenate line strings, segments joining two line strings have zero length
+    points = np.concatenate(polylines)
+    ends = np.cumsum(sizes)
+    starts = ends - sizes
+    seg_lengths = np.sqrt(np.sum(np.diff(points, axis=0) ** 2, axis=1))
+    seg_lengths[ends[:-1] - 1] = 0.
+    cum_length = np.concatenate(([0.], np.cumsum(seg_lengths)))
+    lengths = cum_length[ends - 1] - cum_length[starts]
+
+    # Length along concatenated line string of each output point
+    t = np.linspace(0., 1., nb_out_points) if nb_out_points > 1 else np.zeros(1)
+    pt_lengths = cum_length[starts, None] + lengths[:, None] * t[None, :]
+
+    # Segment of each output point, restricted to its own line string
+    seg_idx = np.searchsorted(cum_length, pt_lengths, side="right") - 1
+    seg_idx = np.clip(seg_idx, starts[:, None], np.maximum(ends - 2, starts)[:, None])
+    next_idx = np.minimum(seg_idx + 1, (ends - 1)[:, None])
+    seg_len = cum_length[next_idx] - cum_length[seg_idx]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ratio = np.where(seg_len > 0., (pt_lengths - cum_length[seg_idx]) / seg_len, 0.)
+    ratio = np.clip(ratio, 0., 1.)[..., None]
+    return points[seg_idx] * (1. - ratio) + points[next_idx] * ratio
+
+
+def cumulative_length(points):
+    """
+    Calculate length along line string at each of its points.
+    :param points: line string points, array shape (n, 2)
+    :return: array shape (n,), first element is 0, last is line string length
+    """
+    seg_lengths = np.sqrt(np.sum(np.diff(points, axis=0) ** 2, axis=1))
+    return np.concatenate(([0.], np.cumsum(seg_lengths)))
 
 
 def point_dist(p0, p1):
@@ -66,40 +113,77 @@ def test_point_dist():
         assert point_dist(p, r) == np.linalg.norm(p-r)
 
 
-def sort_points(points, origin=(0, 0)):
+def sort_points(points, origin=(0, 0), max_gap=30e-3):
     """
-    Sort points in a track line sequence starting from origin.
+    Sort points in a track line sequence starting from origin. Starting from the point nearest to origin, the nearest
+    remaining point is appended until it is further than max_gap. Nearest points are found with a KD-tree.
     :param points: points to sort, array like
     :param origin: origin, starting point
+    :param max_gap: maximal distance between consecutive points, sorting stops at the first larger gap
     :return: sorted points, array
     """
-    origin = np.array(origin)
-    points = np.array(points)
-    sorted = np.empty((0, 2), dtype=np.float32)
+    points = np.asarray(points, dtype=np.float64).reshape((-1, 2))
+    n = len(points)
+    if n == 0:
+        raise ValueError("Point array is empty! Nothing to sort.")
+    tree = cKDTree(points)
+    visited = np.zeros(n, dtype=bool)
+
+    # Neighbours of all points closer than max_gap, sorted by distance, queried at once
+    k = min(8, n)
+    all_dist, all_idx = tree.query(points, k=k, distance_upper_bound=max_gap)
+    all_dist, all_idx = np.reshape(all_dist, (n, k)).tolist(), np.reshape(all_idx, (n, k)).tolist()
 
     # Find point nearest to origin
-    nearest_idx = 0
-    for i, pt in enumerate(points):
-        if point_dist(pt, origin) < point_dist(points[nearest_idx], origin):
-            nearest_idx = i
-    sorted = np.append(sorted, [points[nearest_idx]], axis=0)
-    points = np.delete(points, nearest_idx, axis=0)
+    _, current = tree.query(np.asarray(origin, dtype=np.float64))
+    order = [current]
+    visited[current] = True
 
     # Find next points
-    while len(points) > 0:
-        next_idx = 0
-        for i, pt in enumerate(points):
-            if point_dist(pt, sorted[-1]) < point_dist(points[next_idx], sorted[-1]):
-                next_idx = i
-
-        # Check continuity
-        if point_dist(points[next_idx], sorted[-1]) > 30e-3:
+    while len(order) < n:
+        dist, idx = all_dist[current], all_idx[current]
+        next_idx = next((j for d, j in zip(dist, idx) if d <= max_gap and not visited[j]), None)
+        if next_idx is None and dist[-1] <= max_gap and k < n:
+            # All precomputed neighbours are visited, query more of them
+            dist, idx = tree.query(points[current], k=n, distance_upper_bound=max_gap)
+            next_idx = next((j for d, j in zip(dist, idx) if d <= max_gap and not visited[j]), None)
+        if next_idx is None:
+            # Check continuity
             break
+        current = next_idx
+        order.append(current)
+        visited[current] = True
+
+    return points[order]
 
-        sorted = np.append(sorted, [points[next_idx]], axis=0)
-        points = np.delete(points, next_idx, axis=0)
 
-    return np.array(sorted)
+def sort_points_by_index(points, indices, nb_indices, origin=(0, 0), max_gap=30e-3):
+    """
+    Sort points sampled from a closed line string (e.g. Track points) in line sequence using their line string
+    indices. Sorting starts from the point nearest to origin and follows the line string in the direction that gives
+    the longer continuous sequence.
+    :param points: points to sort, array shape (n, 2)
+    :param indices: line string index of each point, array shape (n,)
+    :param nb_indices: number of line string points, indices wrap around
+    :param origin: origin, starting point
+    :param max_gap: maximal distance between consecutive points, sequence stops at the first larger gap
+    :return: sorted points, array
+    """
+    points = np.asarray(points, dtype=np.float64).reshape((-1, 2))
+    indices = np.asarray(indices)
+    if len(points) == 0:
+        raise ValueError("Point array is empty! Nothing to sort.")
+    start = np.argmin(np.sum((points - np.asarray(origin, dtype=np.float64)) ** 2, axis=1))
+
+    best = None
+    for direction in (1, -1):
+        order = np.argsort((direction * (indices - indices[start])) % nb_indices, kind="stable")
+        gaps = np.sqrt(np.sum(np.diff(points[order], axis=0) ** 2, axis=1))
+        cut = np.flatnonzero(gaps > max_gap)
+        order = order[:cut[0] + 1] if len(cut) > 0 else order
+        if best is None or len(order) > len(best):
+            best = order
+    return points[best]
 
 
 if __name__ == '__main__':
@@ -0,0 +1,172 @@
+"""
+Camera observation images.
+
+CameraBuffer converts rendered frames to the configured resolution, channels and dtype inside preallocated arrays.
+
+PovRenderer renders camera images in software. Track is a flat textured plane, so the camera image is a perspective
+transform (homography) of the track texture. Images are rendered by warping the rendered track image with
+cv2.warpPerspective instead of rendering the pybullet scene with getCameraImage, which is slow or unavailable without
+OpenGL. Bot body is not rendered and there is no lighting, only the track plane is visible.
+"""
+import cv2
+import numpy as np
+
+SUPPORTED_CHANNELS = ["rgb", "gray", "binary"]
+SUPPORTED_DTYPES = ["uint8", "float32"]
+
+
+class CameraBuffer:
+    """
+    Preallocated camera image buffer. Every frame is converted into the same arrays, so the returned image is
+    overwritten by the next frame - copy it to keep it.
+    """
+    # Gray level below which a pixel belongs to line in "binary" images
+    BINARY_THRESHOLD = 128
+
+    def __init__(self, resolution=(320, 240), channels="rgb", dtype="uint8"):
+        """
+        Allocate buffer.
+        :param resolution: image (width, height) in pixels
+        :param channels: "rgb" - RGB image shape (height, width, 3)
+                         "gray" - grayscale image shape (height, width, 1)
+                         "binary" - line mask shape (height, width, 1), line pixels are 255 (1.0 for float32) and other
+                            pixels are 0
+        :param dtype: "uint8" for values in range [0, 255], "float32" for values in range [0, 1]
+        """
+        channels = channels.lower()
+        if channels not in SUPPORTED_CHANNELS:
+            raise ValueError("Camera channels '{}' not supported.".format(channels))
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError("Camera dtype '{}' not supported.".format(dtype))
+        self.resolution = tuple(resolution)
+        self.channels = channels
+        self.dtype = np.dtype(dtype)
+
+        width, height = self.resolution
+        self.frame = np.zeros((height, width, 3 if channels == "rgb" else 1), dtype=np.uint8)
+        # 2D view of single channel frame, cv2 writes into it
+        self._frame_2d = self.frame if channels == "rgb" else self.frame[:, :, 0]
+        self.image = self.frame if self.dtype == np.uint8 else np.zeros(self.frame.shape, dtype=self.dtype)
+
+    @property
+    def shape(self):
+        return self.image.shape
+
+    @property
+    def high(self):
+        """
+        Maximal pixel value.
+        """
+        return 255 if self.dtype == np.uint8 else 1.
+
+    def from_rgba(self, rgba):
+        """
+        Convert RGBA frame, e.g. returned by pybullet getCameraImage().
+        :param rgba: RGBA array shape (height, width, 4) or flat array of the same size
+        :return: image array
+        """
+        width, height = self.resolution
+        rgba = np.asarray(rgba, dtype=np.uint8).reshape((height, width, 4))
+        code = cv2.COLOR_RGBA2RGB if self.channels == "rgb" else cv2.COLOR_RGBA2GRAY
+        cv2.cvtColor(rgba, code, dst=self._frame_2d)
+        return self._finish()
+
+    def from_warp(self, texture, homography):
+        """
+        Render frame by warping a texture.
+        :param texture: RGB texture for "rgb" channels, grayscale texture otherwise
+        :param homography: homography from frame pixels to texture pixels
+        :return: image array
+        """
+        cv2.warpPerspective(texture, homography, self.resolution, dst=self._frame_2d,
+                            flags=cv2.INTER_LINEAR | cv2.WARP_INVERSE_MAP, borderMode=cv2.BORDER_REPLICATE)
+        return self._finish()
+
+    def _finish(self):
+        if self.channels == "binary":
+            cv2.threshold(self._frame_2d, self.BINARY_THRESHOLD - 1, 255, cv2.THRESH_BINARY_INV, dst=self._frame_2d)
+        if self.image is not self.frame:
+            np.multiply(self.frame, 1. / 255., out=self.image, casting="unsafe")
+        return self.image
+
+
+class PovRenderer:
+    """
+    Render pinhole camera images of the track plane from rendered track image.
+    """
+
+    def __init__(self, track_img, plane_size, resolution=(320, 240), channels="rgb", fov=49):
+        """
+        Create renderer.
+        :param track_img: rendered track image, BGR array as returned by Track.render()
+        :param plane_size: (width, height) of track plane in meters, track image covers the whole plane and plane center
+                           is at (0, 0)
+        :param resolution: output image (width, height) in pixels
+        :param channels: output image channels, see CameraBuffer
+        :param fov: vertical field of view in degrees, same as pybullet computeProjectionMatrixFOV()
+        """
+        channels = channels.lower()
+        if channels not in SUPPORTED_CHANNELS:
+            raise ValueError("Camera channels '{}' not supported.".format(channels))
+        self.channels = channels
+        self.resolution = tuple(resolution)
+        self.fov = fov
+
+        if channels == "rgb":
+            self.texture = cv2.cvtColor(track_img, cv2.COLOR_BGR2RGB)
+        else:
+            self.texture = cv2.cvtColor(track_img, cv2.COLOR_BGR2GRAY)
+
+        # Track plane coordinates [x, y, 1] to texture pixel coordinates, pixel centers are at integer coordinates
+        w, h = plane_size
+        h_res, w_res = track_img.shape[:2]
+        self._plane_to_texture = np.array([[w_res / w, 0., w_res / 2 - 0.5],
+                                           [0., -h_res / h, h_res / 2 - 0.5],
+                                           [0., 0., 1.]])
+
+        # Output pixel coordinates [u, v, 1] to ray direction in camera c.s. [right, up, forward]
+        width, height = self.resolution
+        f = (height / 2) / np.tan(np.radians(fov) / 2)
+        self._pixel_to_ray = np.array([[1. / f, 0., (0.5 - width / 2) / f],
+                                       [0., -1. / f, -(0.5 - height / 2) / f],
+                                       [0., 0., 1.]])
+
+    def get_homography(self, eye, target, up=(0., 0., 1.)):
+        """
+        Calculate homography from output image pixels to track image pixels.
+        :param eye: camera position [x, y, z], z must be above track plane
+        :param target: camera target position [x, y, z]
+        :param up: camera up vector
+        :return: homography matrix shape (3, 3)
+        """
+        eye = np.asarray(eye, dtype=np.float64)
+        forward = np.asarray(target, dtype=np.float64) - eye
+        forward /= np.linalg.norm(forward)
+        right = np.cross(forward, up)
+        right /= np.linalg.norm(right)
+        cam_up = np.cross(right, forward)
+
+        # Ray direction in world c.s. for each pixel
+        pixel_to_world = np.stack((right, cam_up, forward), axis=-1) @ self._pixel_to_ray
+        # Intersection of ray eye + t * d with plane z = 0 in homogeneous coordinates:
+        # [ex * dz - ez * dx, ey * dz - ez * dy, dz]
+        ex, ey, ez = eye
+        ray_to_plane = np.array([[-ez, 0., ex],
+                                 [0., -ez, ey],
+                                 [0., 0., 1.]])
+        return self._plane_to_texture @ ray_to_plane @ pixel_to_world
+
+    def render(self, eye, target, buffer=None):
+        """
+        Render camera image.
+        :param eye: camera position [x, y, z]
+        :param target: camera target position [x, y, z]
+        :param buffer: CameraBuffer to render into, must match renderer resolution and channels. If None a new uint8
+                       buffer is allocated.
+        :return: image array, see CameraBuffer
+        """
+        if buffer is None:
+            buffer = CameraBuffer(self.resolution, self.channels)
+        elif buffer.resolution != self.resolution or buffer.channels != self.channels:
+            raise ValueError("Camera buffer does not match renderer resolution and channels.")
+        return buffer.from_warp(self.texture, self.get_homography(eye, target))
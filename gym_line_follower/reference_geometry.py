@@ -5,16 +5,28 @@ import numpy as np
 
 
 class ReferenceGeometry:
+    """
+    Geometry attached to the bot. Vertices are stored as numpy array and moved with one rotation and offset, shapely
+    geometry is only created when requested.
+    """
+    __slots__ = ("origin", "origin_angle", "position", "rotation", "local_vertices", "vertices", "_rot")
 
-    def __init__(self, geometry, origin=(0., 0.), origin_angle=0.):
+    def __init__(self, vertices, origin=(0., 0.), origin_angle=0.):
+        """
+        Init geometry.
+        :param vertices: vertices of geometry at origin position and origin angle, array like shape (n, 2)
+        :param origin: origin position
+        :param origin_angle: origin angle
+        """
         self.origin = origin
         self.origin_angle = origin_angle
 
         self.position = self.origin
         self.rotation = self.origin_angle
 
-        self.geometry = geometry
-        self.plottable = self._get_plottable(geometry)
+        self.local_vertices = np.array(vertices, dtype=np.float64).reshape((-1, 2))
+        self.vertices = self.local_vertices.copy()
+        self._rot = np.eye(2)  # Rotation from local to world c.s., applied to row vectors
 
     def move(self, new_position, new_rotation):
         """
@@ -23,23 +35,50 @@ class ReferenceGeometry:
         :param new_rotation:
         :return: None
         """
-        x_off = new_position[0] - self.position[0]
-        y_off = new_position[1] - self.position[1]
-        ang_off = new_rotation - self.rotation
-
-        self.geometry = rotate(self.geometry, ang_off, origin=self.position, use_radians=True)
-        self.geometry = translate(self.geometry, x_off, y_off)
+        ang_off = new_rotation - self.origin_angle
+        c, s = np.cos(ang_off), np.sin(ang_off)
+        self._rot = np.array([[c, s], [-s, c]])
 
         self.position = new_position
         self.rotation = new_rotation
-        self.plottable = self._get_plottable(self.geometry)
+        self.vertices = self.to_world(self.local_vertices)
+
+    def to_world(self, points):
+        """
+        Convert points from local to world coordinate system.
+        :param points: points in local c.s., array like shape (n, 2)
+        :return: points in world c.s., array shape (n, 2)
+        """
+        points = np.asarray(points, dtype=np.float64).reshape((-1, 2))
+        return (points - self.origin) @ self._rot + self.position
+
+    def to_local(self, points):
+        """
+        Convert points from world to local coordinate system.
+        :param points: points in world c.s., array like shape (n, 2)
+        :return: points in local c.s., array shape (n, 2)
+        """
+        points = np.asarray(points, dtype=np.float64).reshape((-1, 2))
+        return (points - self.position) @ self._rot.T + self.origin
+
+    @property
+    def geometry(self):
+        """
+        Geometry at current position as shapely.geometry instance, created on every access.
+        """
+        return self._get_geometry(self.vertices)
 
-    def _get_plottable(self, geometry):
+    @property
+    def plottable(self):
         """
-        Return tuple of x, y coordinates that can be directly plotted with pyplot.
-        :param geometry: shapely.geometry instance
-        :return: tuple of x, y
+        Tuple of x, y coordinates that can be directly plotted with pyplot.
         """
+        return self._get_plottable(self.vertices)
+
+    def _get_geometry(self, vertices):
+        raise NotImplementedError
+
+    def _get_plottable(self, vertices):
         raise NotImplementedError
 
 
@@ -47,6 +86,7 @@ class CameraWindow(ReferenceGeometry):
     """
     Polygon of arbitrary shape that can be used for determining visibility of points.
     """
+    __slots__ = ("window_points", "_local_edges")
 
     def __init__(self, window_points, *args, **kwargs):
         """
@@ -54,12 +94,17 @@ class CameraWindow(ReferenceGeometry):
         :param window_points: points of the polygon
         """
         self.window_points = window_points
+        super(CameraWindow, self).__init__(window_points, *args, **kwargs)
+
+        # Window edge vectors in local c.s. for vectorized visibility test
+        self._local_edges = np.roll(self.local_vertices, -1, axis=0) - self.local_vertices
 
-        geometry = Polygon(window_points)
-        super(CameraWindow, self).__init__(geometry, *args, **kwargs)
+    def _get_geometry(self, vertices):
+        return Polygon(vertices)
 
-    def _get_plottable(self, geometry):
-        return geometry.exterior.xy
+    def _get_plottable(self, vertices):
+        # Closed polygon ring
+        return np.append(vertices[:, 0], vertices[0, 0]), np.append(vertices[:, 1], vertices[0, 1])
 
     def visible_points(self, points, return_coords=True):
         """
@@ -69,16 +114,28 @@ class CameraWindow(ReferenceGeometry):
         input array
         :return: see above
         """
-        if not isinstance(points, MultiPoint):
-            points = np.array(points)
-            multipoint = MultiPoint(points)  # Convert all points at once to shapely format for performance
-        else:
-            multipoint = points
-        visible = multipoint.intersection(self.geometry)
-        if return_coords:
-            return np.array(visible).reshape((-1, 2))
-        else:
-            return visible
+        if not return_coords:
+            if not isinstance(points, MultiPoint):
+                points = MultiPoint(np.array(points))
+            return points.intersection(self.geometry)
+        if isinstance(points, MultiPoint):
+            points = [(p.x, p.y) for p in points.geoms]
+        points = np.asarray(points, dtype=np.float64).reshape((-1, 2))
+        _, mask = self.visible_local_points(points)
+        return points[mask]
+
+    def visible_local_points(self, points):
+        """
+        Determine visible points with a vectorized point in convex polygon test done in local coordinate system.
+        Points on window boundary are visible.
+        :param points: input points in world c.s., array shape (n, 2)
+        :return: tuple of: visible points in local c.s. array shape (m, 2), boolean visibility mask shape (n,)
+        """
+        local = self.to_local(points)
+        rel = local[:, None, :] - self.local_vertices[None, :, :]
+        cross = self._local_edges[:, 0] * rel[:, :, 1] - self._local_edges[:, 1] * rel[:, :, 0]
+        mask = np.all(cross >= 0., axis=1) | np.all(cross <= 0., axis=1)
+        return local[mask], mask
 
     def convert_to_local(self, geom):
         """
@@ -94,24 +151,26 @@ class CameraWindow(ReferenceGeometry):
         return out
 
     def convert_points_to_local(self, points):
-        out = self.convert_to_local(MultiPoint(points))
-        return np.array(out)
+        return self.to_local(points)
 
     def get_local_window(self):
         return self.__class__(self.window_points, self.origin, self.origin_angle)
 
 
 class ReferencePoint(ReferenceGeometry):
+    __slots__ = ()
 
     def __init__(self, xy_shift):
-        point = Point(xy_shift)
-        super(ReferencePoint, self).__init__(point)
+        super(ReferencePoint, self).__init__([xy_shift])
+
+    def _get_geometry(self, vertices):
+        return Point(vertices[0])
 
-    def _get_plottable(self, geometry):
-        return geometry.x, geometry.y
+    def _get_plottable(self, vertices):
+        return vertices[0, 0], vertices[0, 1]
 
     def get_xy(self):
-        return self.geometry.x, self.geometry.y
+        return float(self.vertices[0, 0]), float(self.vertices[0, 1])
 
 
 if __name__ == '__main__':
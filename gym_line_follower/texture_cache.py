@@ -0,0 +1,142 @@
+import os
+import json
+import warnings
+from collections import OrderedDict
+
+import cv2
+
+root_dir = os.path.dirname(__file__)
+TEXTURE_DIR = os.path.join(root_dir, "track_textures")
+RENDER_CONFIG_FILE = os.path.join(root_dir, "track_render_config.json")
+
+# Background names of Track.render() loaded from image files
+TEXTURE_FILES = {"wood": "wood.jpg",
+                 "wood_2": "wood_2.jpg",
+                 "concrete": "concrete.jpg",
+                 "brick": "brick.jpg",
+                 "checkerboard": "checkerboard.jpg"}
+
+
+class TextureCache:
+    """
+    In-memory cache of decoded background textures. Textures are decoded once and kept at original size, a track
+    render only needs a resize. Resized textures are cached only when requested, e.g. by preload() with sizes known in
+    advance, sizes of randomly generated tracks do not repeat. Least recently used entries are evicted when memory
+    limit is exceeded. Returned arrays are read-only and cached ones are shared between callers.
+    """
+
+    def __init__(self, max_memory=256 * 2**20, texture_dir=TEXTURE_DIR):
+        """
+        Create cache.
+        :param max_memory: maximal size of cached textures in bytes
+        :param texture_dir: directory of texture image files
+        """
+        self.max_memory = max_memory
+        self.texture_dir = texture_dir
+
+        self._textures = OrderedDict()
+        self._memory = 0
+
+    def get(self, name, size=None, keep=False):
+        """
+        Get background texture, decode it only if not cached.
+        :param name: background name, one of TEXTURE_FILES keys
+        :param size: (width, height) in pixels, None for original size
+        :param keep: True to cache the resized texture, use for sizes that are requested again
+        :return: read-only BGR image array
+        """
+        key = (name, None if size is None else tuple(size))
+        img = self._textures.get(key)
+        if img is not None:
+            self._textures.move_to_end(key)
+            return img
+
+        if size is None:
+            img = self._decode(name)
+            self._put(key, img)
+            return img
+        img = cv2.resize(self.get(name), key[1], interpolation=cv2.INTER_LINEAR)
+        if keep:
+            self._put(key, img)
+        else:
+            img.flags.writeable = False
+        return img
+
+    def preload(self, names=None, sizes=None):
+        """
+        Decode textures in advance. Textures with missing files are skipped with a warning.
+        :param names: background names, None for all backgrounds listed in track_render_config.json
+        :param sizes: list of (width, height) sizes to also cache resized textures for, e.g. resolutions of preset
+                      tracks
+        :return: list of preloaded background names
+        """
+        if names is None:
+            names = self.render_config_backgrounds()
+        loaded = []
+        for name in names:
+            if name not in TEXTURE_FILES:
+                continue  # Plain color background
+            try:
+                self.get(name)
+                for size in sizes or ():
+                    self.get(name, size, keep=True)
+            except FileNotFoundError as e:
+                warnings.warn("Skipping texture preload: {}".format(e))
+                continue
+            loaded.append(name)
+        return loaded
+
+    @staticmethod
+    def render_config_backgrounds(path=RENDER_CONFIG_FILE):
+        """
+        Get all background names that can be selected by a track render config.
+        :param path: path of track render config .json file
+        :return: list of background names
+        """
+        with open(path, "r") as f:
+            background = json.load(f).get("background", [])
+        if isinstance(background, dict):
+            names = list(background.get("choice", []))
+            if background.get("default") not in names:
+                names.append(background.get("default"))
+            return names
+        return [background]
+
+    def clear(self):
+        """
+        Remove all textures from memory.
+        """
+        self._textures.clear()
+        self._memory = 0
+
+    def _decode(self, name):
+        try:
+            path = os.path.join(self.texture_dir, TEXTURE_FILES[name])
+        except KeyError:
+            raise ValueError("Invalid background texture '{}'.".format(name))
+        img = cv2.imread(path)
+        if img is None:
+            raise FileNotFoundError("Background texture file '{}' not found.".format(path))
+        return img
+
+    def _put(self, key, img):
+        img.flags.writeable = False  # Cached texture is shared between callers
+        self._memory += img.nbytes
+        self._textures[key] = img
+        while self._memory > self.max_memory and len(self._textures) > 1:
+            _, old = self._textures.popitem(last=False)
+            self._memory -= old.nbytes
+
+
+_default_cache = None
+
+
+def get_default_texture_cache():
+    """
+    Get process wide texture cache, created on first call.
+    :return: TextureCache instance
+    """
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = TextureCache()
+    return _default_cache
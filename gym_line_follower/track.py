@@ -5,11 +5,14 @@ import os
 
 import numpy as np
 from scipy.special import binom
+from scipy.spatial import cKDTree
 from shapely.geometry import MultiPoint, Point, LineString
 from shapely.ops import nearest_points
 
-from gym_line_follower.line_interpolation import interpolate_points
+from gym_line_follower.line_interpolation import interpolate_points, cumulative_length
+from gym_line_follower.texture_cache import TEXTURE_FILES, get_default_texture_cache
 from gym_line_follower.track_generator import Track_Generator
+from gym_line_follower.genetic.de import seed_numba
 
 root_dir = os.path.dirname(__file__)
 
@@ -138,6 +141,8 @@ class Track:
     Line follower follows a Track instance. This class contains methods for randomly generating, rendering and
     calculating relative follower distance, speed and direction.
     """
+    # Distance in meters within which track points count as equally near when resolving track crossings
+    CROSSING_TOLERANCE = 0.03
 
     def __init__(self, pts, nb_checkpoints=100, render_params=None):
         #Center track
@@ -147,7 +152,7 @@ class Track:
         ctr=minp+(w)/2
         pts=pts-ctr
         
-        l = LineString(pts).length
+        l = cumulative_length(np.asarray(pts, dtype=np.float64))[-1]
         n = int(l / 3e-3)  # Get number of points for 3 mm spacing
         self.width=w[0]
         self.height=w[1]
@@ -158,24 +163,48 @@ class Track:
 
         self.render_params = render_params
 
-        self.mpt = MultiPoint(self.pts)
-        self.string = LineString(self.pts)
+        self._mpt = None
+        self._string = None
 
         # Find starting point and angle
         self.start_xy = self.x[0], self.y[0]
         self.start_angle = self.angle_at_index(0)
 
-        # Get length
-        self.length = self.string.length
+        # Get length, cum_length[i] is length along track from start to point i
+        self.cum_length = cumulative_length(self.pts)
+        self.length = self.cum_length[-1]
+        self.closed_length = self.length + np.linalg.norm(self.pts[0] - self.pts[-1])
+        self.point_spacing = self.length / max(len(self.pts) - 1, 1)
+
+        # Spatial index for nearest point queries
+        self.tree = cKDTree(self.pts)
 
         # Progress tracking setup
         self.progress = 0.
         self.progress_idx = 0
         self.nb_checkpoints = nb_checkpoints
-        self.checkpoints = [i * (self.length / self.nb_checkpoints) for i in range(1, self.nb_checkpoints + 1)]
+        self.checkpoints = np.arange(1, self.nb_checkpoints + 1) * (self.length / self.nb_checkpoints)
         self.next_checkpoint_idx = 0
         self.done = False
 
+    @property
+    def mpt(self):
+        """
+        Track points as shapely MultiPoint, created on first access.
+        """
+        if self._mpt is None:
+            self._mpt = MultiPoint(self.pts)
+        return self._mpt
+
+    @property
+    def string(self):
+        """
+        Track points as shapely LineString, created on first access.
+        """
+        if self._string is None:
+            self._string = LineString(self.pts)
+        return self._string
+
     @classmethod
     def generate(cls, approx_width=1., hw_ratio=0.5, seed=None, irregularity=0.2,
                  spikeyness=0.2, num_verts=10, *args, **kwargs):
@@ -187,36 +216,48 @@ class Track:
         :param seed: seed for random generator
         :return: Track instance
         """
-        # Generate random points
-        random.seed(seed)
-        upscale = 1000.  # upscale so curve gen fun works
-        r = upscale * approx_width / 2.
-        pts = generate_polygon(0, 0, r, irregularity=irregularity, spikeyness=spikeyness, numVerts=num_verts)
-        pts = np.array(pts)
-
-        # Generate curve with points
-        x, y, _ = get_bezier_curve(pts, rad=0.2, edgy=0)
-        # Remove duplicated point
-        x = x[:-1]
-        y = y[:-1]
-
-        # Scale y
-        y = y * hw_ratio
-
-        # Scale units
-        unit_scale = 1000
-        x, y = x / unit_scale, y / unit_scale
-        pts = np.stack((x, y), axis=-1)
+        pts = cls.generate_points(approx_width, hw_ratio, seed, irregularity, spikeyness, num_verts)
+        return cls(pts, *args, **kwargs)
 
-        # Check width / height:
-        if max(abs(min(x)), max(x)) * 2 > 1.5 * approx_width or max(abs(min(y)), max(y)) * 2 > 1.5 * approx_width * hw_ratio:
-            return cls.generate(approx_width, hw_ratio, seed, irregularity, spikeyness, num_verts, *args, **kwargs)
+    @staticmethod
+    def generate_points(approx_width=1., hw_ratio=0.5, seed=None, irregularity=0.2,
+                        spikeyness=0.2, num_verts=10):
+        """
+        Generate points of random track, see generate().
+        :return: track points array shape (n, 2)
+        """
+        random.seed(seed)
+        while True:
+            # Generate random points
+            upscale = 1000.  # upscale so curve gen fun works
+            r = upscale * approx_width / 2.
+            pts = generate_polygon(0, 0, r, irregularity=irregularity, spikeyness=spikeyness, numVerts=num_verts)
+            pts = np.array(pts)
+
+            # Generate curve with points
+            x, y, _ = get_bezier_curve(pts, rad=0.2, edgy=0)
+            # Remove duplicated point
+            x = x[:-1]
+            y = y[:-1]
+
+            # Scale y
+            y = y * hw_ratio
+
+            # Scale units
+            unit_scale = 1000
+            x, y = x / unit_scale, y / unit_scale
+            pts = np.stack((x, y), axis=-1)
+
+            # Check width / height, retry with the next random numbers so seeded generation always terminates
+            if max(abs(min(x)), max(x)) * 2 <= 1.5 * approx_width and \
+                    max(abs(min(y)), max(y)) * 2 <= 1.5 * approx_width * hw_ratio:
+                break
 
         # Randomly flip track direction
         np.random.seed(seed)
         if np.random.choice([True, False]):
             pts = np.flip(pts, axis=0)
-        return cls(pts, *args, **kwargs)
+        return pts
 
     @classmethod
     def generate_robotracer(cls, approx_width=4., seed=None,
@@ -228,21 +269,46 @@ class Track:
         :param num_verts: aprox number of segments
         :return: Track instance
         """
-        # Generate random points
+        pts = cls.generate_robotracer_points(approx_width, seed, num_segs)
+        return cls(pts, *args, **kwargs)
+
+    @staticmethod
+    def generate_robotracer_points(approx_width=4., seed=None, num_segs=10):
+        """
+        Generate points of random robotracer track, see generate_robotracer().
+        :return: track points array shape (n, 2)
+        """
+        tr = Track.robotracer_generator(approx_width, seed, num_segs)
+        return Track.generator_points(tr)
+
+    @staticmethod
+    def robotracer_generator(approx_width=4., seed=None, num_segs=10):
+        """
+        Run robotracer track generator, see generate_robotracer().
+        :return: Track_Generator instance, units are mm
+        """
         random.seed(seed)
         np.random.seed(seed)
+        if seed is not None:
+            seed_numba(seed)  # Differential evolution draws permutations inside numba
         upscale = 1000.  # upscale so curve gen fun works
         r = upscale * approx_width / 2.
-        tr = Track_Generator.generate(0,0,r, numSeg=num_segs)
+        return Track_Generator.generate(0,0,r, numSeg=num_segs)
+
+    @staticmethod
+    def generator_points(tr):
+        """
+        Get points of track built by Track_Generator.
+        :param tr: Track_Generator instance
+        :return: track points array shape (n, 2) in meters
+        """
         x,y = tr.get_vect()
 
         # Scale units
         unit_scale = 1000
         x, y = x / unit_scale, y / unit_scale
         pts = np.stack((x, y), axis=-1)
-
-
-        return cls(pts, *args, **kwargs)
+        return pts
 
     @classmethod
     def from_file(cls, path, *args, **kwargs):
@@ -254,7 +320,7 @@ class Track:
         return cls(points, *args, **kwargs)
     
     def _render(self, border_w=0.3, ppm=1500, line_thickness=0.015, save=None, line_color="black",
-                background="white", line_opacity=0.8, dashed=False):
+                background="white", line_opacity=0.8, dashed=False, subpixel_bits=0):
         """
         Render track using open-cv
         :param border_w: track outside border width in meters
@@ -266,6 +332,9 @@ class Track:
         :param background: string or BGR tuple
                            options: [wood, wood_2, concrete, brick, checkerboard, white, gray]
         :param line_opacity: opacity of line in range 0, 1 where 0 is fully transparent
+        :param dashed: dash length in meters, False for solid line
+        :param subpixel_bits: number of fractional bits of line point pixel coordinates, 0 rounds points to whole
+                              pixels
         :return: rendered track image array
         """
         import cv2
@@ -278,16 +347,9 @@ class Track:
         background_bgr = None
         if isinstance(background, str):
             background = background.lower()
-            if background == "wood":
-                bg = cv2.imread(os.path.join(root_dir, "track_textures", "wood.jpg"))
-            elif background == "wood_2":
-                bg = cv2.imread(os.path.join(root_dir, "track_textures", "wood_2.jpg"))
-            elif background == "concrete":
-                bg = cv2.imread(os.path.join(root_dir, "track_textures", "concrete.jpg"))
-            elif background == "brick":
-                bg = cv2.imread(os.path.join(root_dir, "track_textures", "brick.jpg"))
-            elif background == "checkerboard":
-                bg = cv2.imread(os.path.join(root_dir, "track_textures", "checkerboard.jpg"))
+            if background in TEXTURE_FILES:
+                # Decoded and resized texture is cached, read-only
+                bg = get_default_texture_cache().get(background, (w_res, h_res))
             elif background == "white":
                 background_bgr = (255, 255, 255)
             elif background == "gray":
@@ -300,8 +362,6 @@ class Track:
                 bg[:, :, 0] *= background_bgr[0]
                 bg[:, :, 1] *= background_bgr[1]
                 bg[:, :, 2] *= background_bgr[2]
-            else:
-                bg = cv2.resize(bg, (w_res, h_res), interpolation=cv2.INTER_LINEAR)
 
         elif isinstance(background, tuple):
             bg = np.ones((h_res, w_res, 3), dtype=np.uint8)
@@ -333,32 +393,16 @@ class Track:
         if dashed:
             pts = interpolate_points(self.pts, 1000)
             n = self.length / dashed
-            chunks = np.array_split(pts, n)[::2]
-            for c in chunks:
-                for i in range(len(c) - 1):
-                    x1, y1 = c[i]
-                    x1_img = int(round((x1 + w / 2) * ppm, ndigits=0))
-                    y1_img = int(round(h_res - (y1 + h / 2) * ppm, ndigits=0))
-
-                    x2, y2 = c[i + 1]
-                    x2_img = int(round((x2 + w / 2) * ppm, ndigits=0))
-                    y2_img = int(round(h_res - (y2 + h / 2) * ppm, ndigits=0))
-
-                    cv2.line(line, (x1_img, y1_img), (x2_img, y2_img), color=line_bgr, thickness=t_res,
-                             lineType=cv2.LINE_AA)
+            polylines = np.array_split(pts, int(n))[::2]
         else:
-            for i in range(len(self.pts) - 1):
-                x1, y1 = self.pts[i]
-                x1_img = int(round((x1 + w / 2) * ppm, ndigits=0))
-                y1_img = int(round(h_res - (y1 + h / 2) * ppm, ndigits=0))
-
-                x2, y2 = self.pts[i + 1]
-                x2_img = int(round((x2 + w / 2) * ppm, ndigits=0))
-                y2_img = int(round(h_res - (y2 + h / 2) * ppm, ndigits=0))
-
-                cv2.line(line, (x1_img, y1_img), (x2_img, y2_img), color=line_bgr, thickness=t_res,
-                         lineType=cv2.LINE_AA)
-                #cv2.circle(line,(x1_img,y1_img),radius=int(0.1*ppm),color=(255,0,0),thickness=4)
+            polylines = [self.pts]
+        # All polylines are converted to fixed point pixel coordinates at once and drawn with one call
+        pts = np.concatenate(polylines)
+        px = np.stack(((pts[:, 0] + w / 2) * ppm, h_res - (pts[:, 1] + h / 2) * ppm), axis=-1)
+        px = np.round(px * (1 << subpixel_bits)).astype(np.int32)
+        px = np.split(px, np.cumsum([len(c) for c in polylines])[:-1])
+        cv2.polylines(line, px, isClosed=False, color=line_bgr, thickness=t_res, lineType=cv2.LINE_AA,
+                      shift=subpixel_bits)
 
         alpha = line_opacity
         out = cv2.addWeighted(line, alpha, bg, 1 - alpha, 0)
@@ -379,14 +423,19 @@ class Track:
         :param pt: position. [x, y] or shapely.geometry.Point instance
         :return: minimal absolute distance to track, float
         """
-        # if not isinstance(pt, Point):
-        #     pt = Point(pt)
-        # return pt.distance(self.mpt)
-        pt=np.array(pt)
-        win=np.clip([self.progress_idx-100,self.progress_idx+100],0,len(self.pts))
-        searchW=self.pts[win[0]:win[1]]
-        d=np.sqrt(np.sum((searchW-pt)**2,axis=1))
-        return np.min(d)
+        if isinstance(pt, Point):
+            pt = (pt.x, pt.y)
+        dist, _ = self.tree.query(pt)
+        return float(dist)
+
+    def distance_from_point_batch(self, pts):
+        """
+        Calculate minimal distances of positions from track.
+        :param pts: positions, array shape (n, 2)
+        :return: array of minimal absolute distances shape (n,)
+        """
+        dist, _ = self.tree.query(np.asarray(pts, dtype=np.float64).reshape((-1, 2)))
+        return dist
 
     def vector_at_index(self, idx):
         """
@@ -423,12 +472,59 @@ class Track:
             track_ang += 2 * np.pi
         return track_ang
 
-    def nearest_point_idx(self,pt):
-        pt=np.array(pt)
-        win=np.clip([self.progress_idx-100,self.progress_idx+100],0,len(self.pts))
-        searchW=self.pts[win[0]:win[1]]
-        d=np.sqrt(np.sum((searchW-pt)**2,axis=1))
-        return np.argmin(d)
+    def nearest_point_idx(self, pt, hint_idx=None):
+        """
+        Find index of track point nearest to provided point.
+        :param pt: point coordinates [x, y]
+        :param hint_idx: index of track point the point is known to be near, e.g. progress index. Where the track passes
+                         near itself (crossings), all track points within CROSSING_TOLERANCE of the nearest distance are
+                         grouped into continuous track sections and the nearest point of the section closest to
+                         hint_idx along the track is returned. None to return the nearest point.
+        :return: index of nearest track point
+        """
+        if isinstance(pt, Point):
+            pt = (pt.x, pt.y)
+        dist, idx = self.tree.query(pt)
+        if hint_idx is None:
+            return int(idx)
+
+        n = len(self.pts)
+        candidates = np.sort(self.tree.query_ball_point(pt, dist + self.CROSSING_TOLERANCE))
+        sections = np.split(candidates, np.flatnonzero(np.diff(candidates) > 1) + 1)
+        if len(sections) == 1:
+            return int(idx)
+        if sections[0][0] == 0 and sections[-1][-1] == n - 1:
+            # Section continues over track start
+            sections[0] = np.concatenate((sections.pop(), sections[0]))
+
+        def dist_along(section):
+            d = np.abs(section - hint_idx)
+            return np.min(np.minimum(d, n - d))
+        section = min(sections, key=dist_along)
+        d = np.sum((self.pts[section] - np.asarray(pt)) ** 2, axis=1)
+        return int(section[np.argmin(d)])
+
+    def nearest_point_idx_batch(self, pts):
+        """
+        Find indices of track points nearest to provided points.
+        :param pts: points, array shape (n, 2)
+        :return: index array shape (n,)
+        """
+        _, idx = self.tree.query(np.asarray(pts, dtype=np.float64).reshape((-1, 2)))
+        return idx
+
+    def indices_around(self, idx, nb_before, nb_after):
+        """
+        Get indices of track points around a track point in track order. Track is closed so indices wrap around track
+        start, each index is returned at most once.
+        :param idx: index of center track point
+        :param nb_before: number of points before center point
+        :param nb_after: number of points after center point
+        :return: index array
+        """
+        n = len(self.pts)
+        start = idx - nb_before
+        return np.arange(start, start + min(nb_before + nb_after + 1, n)) % n
 
     def nearest_point(self, pt):
         """
@@ -450,7 +546,7 @@ class Track:
         """
         # near_x, near_y = self.nearest_point(pt)
         # near_idx = np.where(self.x == near_x)[0][0]
-        near_idx=self.nearest_point_idx(pt)
+        near_idx = self.nearest_point_idx(pt, hint_idx=self.progress_idx)
         return self.angle_at_index(near_idx)
 
     def nearest_vector(self, pt):
@@ -461,7 +557,7 @@ class Track:
         """
         # near_x, near_y = self.nearest_point(pt)
         # near_idx = np.where(self.x == near_x)[0][0]
-        near_idx = self.nearest_point_idx(pt)
+        near_idx = self.nearest_point_idx(pt, hint_idx=self.progress_idx)
         return self.vector_at_index(near_idx)
 
     def length_between_idx(self, idx1, idx2, shortest=True):
@@ -474,39 +570,33 @@ class Track:
         """
         if idx1 == idx2:
             return 0.
-        if idx1 < idx2:
-            first = idx1
-            second = idx2
-        else:
-            first = idx2
-            second = idx1
-        string_1 = LineString(self.pts[first:second+1])
-        string_2 = LineString(np.concatenate((self.pts[0:first+1], self.pts[second:])))
-        len_1 = string_1.length
-        len_2 = string_2.length
+        sign = 1. if idx1 < idx2 else -1.
+        # Length between indices and length of the rest of closed track
+        len_1 = abs(float(self.cum_length[idx2] - self.cum_length[idx1]))
+        len_2 = self.closed_length - len_1
 
         if len_1 < len_2:
-            if idx1 < idx2:
-                if shortest:
-                    return len_1
-                else:
-                    return -len_2
-            else:
-                if shortest:
-                    return -len_1
-                else:
-                    return len_2
+            return sign * len_1 if shortest else -sign * len_2
         else:
-            if idx1 < idx2:
-                if shortest:
-                    return -len_2
-                else:
-                    return len_1
-            else:
-                if shortest:
-                    return len_2
-                else:
-                    return -len_1
+            return -sign * len_2 if shortest else sign * len_1
+
+    def length_between_idx_batch(self, idx1, idx2, shortest=True):
+        """
+        Calculate lengths of track segments between arrays of point indexes, see length_between_idx().
+        :param idx1: first indices, array like
+        :param idx2: second indices, array like
+        :param shortest: True to return shortest paths, False to return longest
+        :return: array of segment lengths
+        """
+        idx1, idx2 = np.asarray(idx1), np.asarray(idx2)
+        sign = np.where(idx1 < idx2, 1., -1.)
+        len_1 = np.abs(self.cum_length[idx2] - self.cum_length[idx1])
+        len_2 = self.closed_length - len_1
+        if shortest:
+            out = np.where(len_1 < len_2, sign * len_1, -sign * len_2)
+        else:
+            out = np.where(len_1 < len_2, -sign * len_2, sign * len_1)
+        return np.where(idx1 == idx2, 0., out)
 
     def length_along_track(self, pt1, pt2):
         """
@@ -521,8 +611,8 @@ class Track:
 
         # idx_1 = np.where(self.x == near_1[0])[0][0]
         # idx_2 = np.where(self.x == near_2[0])[0][0]
-        idx_1=self.nearest_point_idx(pt1)
-        idx_2=self.nearest_point_idx(pt2)
+        idx_1 = self.nearest_point_idx(pt1, hint_idx=self.progress_idx)
+        idx_2 = self.nearest_point_idx(pt2, hint_idx=self.progress_idx)
         return self.length_between_idx(idx_1, idx_2, shortest=True)
 
     def position_along(self, pt):
@@ -533,8 +623,24 @@ class Track:
         """
         # near = self.nearest_point(pt)
         # idx = np.where(self.x == near[0])[0][0]
-        idx=self.nearest_point_idx(pt)
-        return (idx / len(self.pts)) * self.length
+        idx = self.nearest_point_idx(pt, hint_idx=self.progress_idx)
+        return self.position_along_idx(idx)
+
+    def position_along_idx(self, idx):
+        """
+        Get position along track from start of track of track points.
+        :param idx: index of track point or array of indices
+        :return: position in range [0, track length], float or array
+        """
+        return self.cum_length[idx]
+
+    def checkpoints_passed(self, position):
+        """
+        Get number of checkpoints at or before a position along track.
+        :param position: position along track in meters from starting point, float or array
+        :return: number of checkpoints, int or array
+        """
+        return np.searchsorted(self.checkpoints, position, side="right")
 
     def update_progress(self, position):
         """
@@ -547,13 +653,13 @@ class Track:
         if position > self.progress:
             self.progress = position
             self.progress_idx = int(round((self.progress / self.length) * len(self.pts)))
-        ret = 0
-        while self.progress >= self.checkpoints[self.next_checkpoint_idx]:
-            self.next_checkpoint_idx += 1
-            ret += 1
-            if self.next_checkpoint_idx >= self.nb_checkpoints-1:
-                self.done = True
-                break
+        next_checkpoint_idx = min(int(self.checkpoints_passed(self.progress)), self.nb_checkpoints - 1)
+        if next_checkpoint_idx <= self.next_checkpoint_idx:
+            return 0
+        ret = next_checkpoint_idx - self.next_checkpoint_idx
+        self.next_checkpoint_idx = next_checkpoint_idx
+        if self.next_checkpoint_idx >= self.nb_checkpoints - 1:
+            self.done = True
         return ret
 
     def reset_progress(self):
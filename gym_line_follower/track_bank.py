@@ -0,0 +1,246 @@
+"""
+Bank of pre-generated tracks.
+
+Tracks are generated offline and stored in a single compressed archive, so environment reset only has to load track
+points instead of running the (slow and unpredictable) track generator. Archive is a zip file with one .npy entry
+with track points and one .json entry with metadata per track. It is not a plain .npz file, numpy.load() lists the
+.json entries but can not read them, use TrackBank to read the archive.
+
+Generate a bank from command line:
+    python -m gym_line_follower.track_bank tracks.npz --nb-tracks 1000 --track-type robotracer --workers 8
+
+Track i is generated with a seed derived from the base seed and i with numpy SeedSequence, so a bank can be reproduced
+regardless of the number of workers. Failed attempts are retried with seeds derived from the same track index.
+"""
+import io
+import os
+import json
+import argparse
+import zipfile
+import contextlib
+import multiprocessing
+from functools import partial
+
+import numpy as np
+
+from gym_line_follower.track import Track
+from gym_line_follower.line_interpolation import cumulative_length
+
+
+def track_entry_name(idx):
+    return "track_{:06d}".format(idx)
+
+
+def write_track(archive, name, pts, metadata):
+    """
+    Write track to open archive.
+    :param archive: zipfile.ZipFile opened for writing
+    :param name: entry name
+    :param pts: track points array shape (n, 2)
+    :param metadata: json serializable dict
+    """
+    buf = io.BytesIO()
+    np.save(buf, np.asarray(pts, dtype=np.float64))
+    archive.writestr(name + ".npy", buf.getvalue())
+    archive.writestr(name + ".json", json.dumps(metadata))
+
+
+def generate_track_points(track_type, seed, approx_width=1.75):
+    """
+    Generate points of a random track with the same parameters as used by LineFollowerEnv.
+    :param track_type: "simple" or "robotracer"
+    :param seed: seed for random generator
+    :param approx_width: approx. width of generated track
+    :return: track points array shape (n, 2)
+    """
+    return generate_track(track_type, seed, approx_width)[0]
+
+
+def generate_track(track_type, seed, approx_width=1.75):
+    """
+    Generate random track, see generate_track_points().
+    :return: track points array shape (n, 2), metadata dict with track length in meters. Robotracer metadata also
+             contains generated segments and marks (start, curvature changes and finish as [x, y, angle]).
+    """
+    if track_type == "simple":
+        pts = Track.generate_points(approx_width, hw_ratio=0.7, seed=seed, spikeyness=0.3)
+        length = cumulative_length(np.concatenate((pts, pts[:1])))[-1]
+        return pts, {"length": float(length)}
+    elif track_type == "robotracer":
+        tr = Track.robotracer_generator(approx_width, seed=seed)
+        pts = Track.generator_points(tr)
+        # Generator units are mm
+        segments = [{"type": type(seg).__name__.lower(), "ds": float(seg.ds) / 1000., "da": float(seg.da)}
+                    for seg in tr.segments]
+        marks = [[float(x) / 1000., float(y) / 1000., float(ang)] for x, y, ang in tr.get_marks()]
+        return pts, {"length": tr.get_length(), "segments": segments, "marks": marks}
+    else:
+        raise ValueError("Track type '{}' not supported.".format(track_type))
+
+
+def track_seed(seed, idx, attempt=0):
+    """
+    Derive seed of a track generation attempt.
+    :param seed: base seed of the bank
+    :param idx: track index
+    :param attempt: number of failed attempts before this one
+    :return: integer seed in range [0, 2**32)
+    """
+    return int(np.random.SeedSequence(seed, spawn_key=(idx, attempt)).generate_state(1)[0])
+
+
+def _generate_bank_track(idx, track_type, seed, approx_width, max_attempts):
+    """
+    Generate track of a bank, retrying with a new seed if generation fails. Runs in worker processes.
+    :return: track index, points, metadata
+    """
+    for attempt in range(max_attempts):
+        s = track_seed(seed, idx, attempt)
+        try:
+            # Generators print progress, keep worker output readable
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                pts, metadata = generate_track(track_type, s, approx_width)
+        except Exception as e:
+            print("Track {} attempt {} failed: {}".format(idx, attempt, e))
+            continue
+        if len(pts) < 3 or not np.all(np.isfinite(pts)):
+            print("Track {} attempt {} failed: invalid points".format(idx, attempt))
+            continue
+        metadata.update({"track_type": track_type, "seed": s, "base_seed": seed, "attempt": attempt,
+                         "approx_width": approx_width})
+        return idx, pts, metadata
+    raise RuntimeError("Track {} failed in {} attempts.".format(idx, max_attempts))
+
+
+def generate_track_bank(path, nb_tracks, track_type="simple", seed=0, approx_width=1.75, workers=1,
+                        max_attempts=10):
+    """
+    Generate tracks and write them to archive. Tracks are written as they finish.
+    :param path: archive path
+    :param nb_tracks: number of tracks to generate
+    :param track_type: "simple" or "robotracer"
+    :param seed: base seed, seed of each track is derived from it and the track index, see track_seed()
+    :param approx_width: approx. width of generated tracks
+    :param workers: number of worker processes, 0 for number of CPUs
+    :param max_attempts: maximal number of generation attempts per track
+    """
+    task = partial(_generate_bank_track, track_type=track_type, seed=seed, approx_width=approx_width,
+                   max_attempts=max_attempts)
+    workers = workers or os.cpu_count()
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        if workers == 1:
+            results = map(task, range(nb_tracks))
+            pool = None
+        else:
+            pool = multiprocessing.Pool(workers)
+            results = pool.imap_unordered(task, range(nb_tracks))
+        try:
+            for i, (idx, pts, metadata) in enumerate(results):
+                write_track(archive, track_entry_name(idx), pts, metadata)
+                print("Generated track {}/{}".format(i + 1, nb_tracks))
+        except BaseException:
+            # Stop workers still generating tracks
+            if pool is not None:
+                pool.terminate()
+            raise
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+
+class TrackBank:
+    """
+    Read access to track archive. Tracks are selected by index or sampled with a seed in constant time.
+    """
+
+    def __init__(self, path, lazy=True):
+        """
+        Open track archive.
+        :param path: archive path
+        :param lazy: True to load track points on first access, False to load all tracks at once
+        """
+        self.path = path
+        self.lazy = lazy
+        self._archive = zipfile.ZipFile(path, "r")
+        self.names = sorted(n[:-len(".npy")] for n in self._archive.namelist() if n.endswith(".npy"))
+        if len(self.names) == 0:
+            raise ValueError("No tracks in archive '{}'.".format(path))
+        self._points = {}
+        if not lazy:
+            for idx in range(len(self.names)):
+                self.get_points(idx)
+
+    def __len__(self):
+        return len(self.names)
+
+    def get_points(self, idx):
+        """
+        Get track points.
+        :param idx: track index
+        :return: track points array shape (n, 2)
+        """
+        pts = self._points.get(idx)
+        if pts is None:
+            with self._archive.open(self.names[idx] + ".npy") as f:
+                pts = np.load(io.BytesIO(f.read()))
+            self._points[idx] = pts
+        return pts
+
+    def get_metadata(self, idx):
+        """
+        Get track metadata.
+        :param idx: track index
+        :return: metadata dict
+        """
+        return json.loads(self._archive.read(self.names[idx] + ".json").decode())
+
+    def get_track(self, idx, *args, **kwargs):
+        """
+        Create track instance from bank.
+        :param idx: track index
+        :param args, kwargs: Track arguments
+        :return: Track instance
+        """
+        return Track(self.get_points(idx), *args, **kwargs)
+
+    def sample_index(self, seed=None):
+        """
+        Select random track index.
+        :param seed: seed for random generator, the same seed always selects the same track. If None global numpy
+                     random generator is used.
+        :return: track index
+        """
+        rng = np.random if seed is None else np.random.RandomState(seed)
+        return int(rng.randint(len(self)))
+
+    def sample(self, seed=None, *args, **kwargs):
+        """
+        Create track instance of randomly selected track.
+        :param seed: seed for random generator, see sample_index()
+        :param args, kwargs: Track arguments
+        :return: Track instance
+        """
+        return self.get_track(self.sample_index(seed), *args, **kwargs)
+
+    def close(self):
+        self._archive.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate bank of random tracks.")
+    parser.add_argument("path", help="output archive path (.npz)")
+    parser.add_argument("-n", "--nb-tracks", type=int, default=100, help="number of tracks to generate")
+    parser.add_argument("-t", "--track-type", default="simple", choices=["simple", "robotracer"],
+                        help="type of tracks")
+    parser.add_argument("-s", "--seed", type=int, default=0, help="base seed, track seeds are derived from it")
+    parser.add_argument("-w", "--approx-width", type=float, default=1.75, help="approx. width of tracks in meters")
+    parser.add_argument("-j", "--workers", type=int, default=1, help="number of worker processes, 0 for all CPUs")
+    parser.add_argument("--max-attempts", type=int, default=10, help="maximal number of attempts per track")
+    args = parser.parse_args()
+    generate_track_bank(args.path, args.nb_tracks, args.track_type, args.seed, args.approx_width, args.workers,
+                        args.max_attempts)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+from collections import OrderedDict
+
+import numpy as np
+
+from gym_line_follower.utils import TrackRefImg
+
+SAT_FILE = "track_ir_sat.generated.npy"
+
+
+class TrackAssetCache:
+    """
+    Cache of rendered track images and IR reference images. Entries are content addressed - key is a hash of track
+    points, render parameters, border width and resolution - so a repeated track (fixed seed, preset track or track
+    bank) maps to an existing entry and is not rendered again.
+    Rendered images and reference images of repeated tracks are kept in memory. IR summed-area tables of repeated
+    tracks are also stored in a directory on disk, one subdirectory per entry, and memory-mapped from there. Both
+    levels evict least recently used entries when their size limit is exceeded. Tables are written atomically so one
+    cache directory can be shared by several processes.
+    """
+
+    def __init__(self, cache_dir=None, max_memory=128 * 2**20, max_disk=1024 * 2**20):
+        """
+        Create cache.
+        :param cache_dir: directory of on-disk cache, if None directory in system temp is used
+        :param max_memory: maximal size of in-memory images and summed-area tables in bytes
+        :param max_disk: maximal size of on-disk cache in bytes
+        """
+        if cache_dir is None:
+            cache_dir = os.path.join(tempfile.gettempdir(), "linegym_cache")
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache_dir = cache_dir
+        self.max_memory = max_memory
+        self.max_disk = max_disk
+
+        self._images = {}
+        self._ref_imgs = {}
+        # Least recently used order and size of in-memory entries of both kinds, keys are (kind, cache key)
+        self._lru = OrderedDict()
+        self._memory = 0
+
+    @staticmethod
+    def get_key(track, border_w, ppm):
+        """
+        Calculate cache key of rendered track.
+        :param track: Track instance
+        :param border_w: track outside border width in meters
+        :param ppm: render resolution in pixel per meter
+        :return: key, hex string
+        """
+        h = hashlib.sha1()
+        h.update(np.ascontiguousarray(track.pts, dtype=np.float64).tobytes())
+        render_params = dict(track.render_params) if track.render_params else {}
+        h.update(json.dumps(render_params, sort_keys=True, default=str).encode())
+        h.update(repr((float(border_w), float(ppm))).encode())
+        return h.hexdigest()
+
+    def get_image(self, key):
+        """
+        Get rendered track image from memory.
+        :param key: cache key
+        :return: read-only image array or None if not cached
+        """
+        img = self._images.get(key)
+        if img is not None:
+            self._lru.move_to_end(("image", key))
+        return img
+
+    def get_track_image(self, track, border_w=0.3, ppm=1000):
+        """
+        Get rendered track image, render it only if not cached. Image is kept in memory only.
+        :param track: Track instance
+        :param border_w: track outside border width in meters
+        :param ppm: render resolution in pixel per meter
+        :return: read-only track image array
+        """
+        key = self.get_key(track, border_w, ppm)
+        img = self.get_image(key)
+        if img is None:
+            img = track.render(border_w=border_w, ppm=ppm)
+            self._put_image(key, img)
+        return img
+
+    def get_track_ref_img(self, track, border_w=0.3, ppm=1000, persist=False):
+        """
+        Get IR sensor reference image of track. With persist the reference image is memoized per rendered track and its
+        summed-area table is stored in the entry directory and memory-mapped, so it is built once and shared between
+        processes. Stored tables count against the disk limit, a table larger than the limit is kept in memory only.
+        Memoized reference images count against the memory limit.
+        :param track: Track instance
+        :param border_w: track outside border width in meters
+        :param ppm: render resolution in pixel per meter
+        :param persist: True if the track is expected to be used again (preset track, track bank, fixed seed). Other
+                        reference images are not memoized and their tables are kept in memory only, unless already
+                        stored on disk.
+        :return: TrackRefImg instance
+        """
+        key = self.get_key(track, border_w, ppm)
+        ref_img = self._ref_imgs.get(key)
+        if ref_img is not None:
+            self._lru.move_to_end(("ref_img", key))
+            return ref_img
+
+        img = self.get_track_image(track, border_w=border_w, ppm=ppm)
+        entry_dir = os.path.join(self.cache_dir, key)
+        sat_file = os.path.join(entry_dir, SAT_FILE)
+        sat_size = (img.shape[0] + 1) * (img.shape[1] + 1) * 4
+        if not persist and not os.path.exists(sat_file):
+            # Track is not used again, table is built when the sensor needs it and not memoized
+            return TrackRefImg(img, ppm)
+        if sat_size > self.max_disk:
+            # Table alone would exceed the disk limit, keep it in memory only
+            ref_img = TrackRefImg(img, ppm)
+        else:
+            os.makedirs(entry_dir, exist_ok=True)
+            ref_img = TrackRefImg(img, ppm, sat_file=sat_file)
+        # Load or build the table now, so the entry size is known when the limits are enforced
+        ref_img.track_image
+        if ref_img.sat_file is not None:
+            os.utime(entry_dir)  # Mark as recently used
+            self._evict_disk(keep=key)
+        self._put("ref_img", key, ref_img, sat_size)
+        return ref_img
+
+    def clear(self):
+        """
+        Remove all entries from memory and disk.
+        """
+        self._images.clear()
+        self._ref_imgs.clear()
+        self._lru.clear()
+        self._memory = 0
+        for name in os.listdir(self.cache_dir):
+            shutil.rmtree(os.path.join(self.cache_dir, name), ignore_errors=True)
+
+    def _put_image(self, key, img):
+        img.flags.writeable = False  # Cached image is shared between callers
+        self._put("image", key, img, img.nbytes)
+
+    def _put(self, kind, key, value, size):
+        """
+        Add in-memory entry and evict least recently used entries of both kinds while memory limit is exceeded.
+        :param kind: "image" or "ref_img"
+        :param key: cache key
+        :param value: track image or TrackRefImg instance
+        :param size: entry size in bytes
+        """
+        entries = self._images if kind == "image" else self._ref_imgs
+        self._memory += size - self._lru.pop((kind, key), 0)
+        entries[key] = value
+        self._lru[(kind, key)] = size
+        while self._memory > self.max_memory and len(self._lru) > 1:
+            (old_kind, old_key), old_size = self._lru.popitem(last=False)
+            self._memory -= old_size
+            if old_kind == "image":
+                del self._images[old_key]
+                # Reference image holds the rendered image, it is evicted with it so held memory stays counted
+                if old_key in self._ref_imgs:
+                    self._memory -= self._lru.pop(("ref_img", old_key))
+                    del self._ref_imgs[old_key]
+            else:
+                del self._ref_imgs[old_key]
+
+    def _evict_disk(self, keep=None):
+        entries = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            entry_dir = os.path.join(self.cache_dir, name)
+            if not os.path.isdir(entry_dir):
+                continue
+            try:
+                size = sum(f.stat().st_size for f in os.scandir(entry_dir))
+                entries.append((os.stat(entry_dir).st_mtime, size, name))
+            except OSError:  # Removed concurrently
+                continue
+            total += size
+        for _, size, name in sorted(entries):
+            if total <= self.max_disk:
+                break
+            if name == keep:
+                continue
+            shutil.rmtree(os.path.join(self.cache_dir, name), ignore_errors=True)
+            total -= size
+
+
+_default_cache = None
+
+
+def get_default_track_cache():
+    """
+    Get process wide track asset cache, created on first call.
+    :return: TrackAssetCache instance
+    """
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = TrackAssetCache()
+    return _default_cache
@@ -2,10 +2,10 @@
 import numpy as np
 import math
 import random
-from gym_line_follower.trackutils import collision_dect,collision_dect2
+from gym_line_follower.trackutils import collision_dect,collision_dect2,CollisionGrid
 from gym_line_follower.trackutils import rect_p,get_rect,curve_p,get_curve
 from gym_line_follower.genetic.de import diff_evolution
-from gym_line_follower.genetic.fitness import curves_fitness
+from gym_line_follower.genetic.fitness import curves_fitness_batch
 import pickle
 from abc import ABC, abstractmethod
 
@@ -116,42 +116,56 @@ class Rect(Segment):
 
 class Track_Generator(object):
     """Track_Generator class. allows random initialization or manual construction"""
-    def __init__(self, ctrX, ctrY, aveRadius,bar=False):
+    # Distance between points used for collision checks
+    CHECK_PD = 50
+    # Collision distance threshold, also the cell size of collision grids
+    CHECK_TH = 100
+
+    def __init__(self, ctrX, ctrY, aveRadius,bar=False,num_threads=1):
         """
         Creates empty track
         :param ctrX,ctrY: Center of the track 
         :param aveRadius: Average radius of the track
         :param bar: Toggles the progress bar when using joint_points
+        :param num_threads: Number of threads used to evaluate fitness in join_points, 0 for all hardware threads
         """
         super(Track_Generator, self).__init__()
         self.segments = []
         self.endline = []
+        # Points of accepted segments at CHECK_PD, grows with self.segments. Use _add_segments() to add segments.
+        self._points = np.zeros((64, 2))
+        self._nb_points = 0
+        self._endline_points = np.zeros((0, 2))
+        # Endline and track points, in the order they are checked against
+        self._grid = CollisionGrid(self.CHECK_TH)
         self.start_finish_D=1000
         self.ctr=(ctrX,ctrY)
         self.aveRadius=aveRadius
         self.bar=bar
+        self.num_threads=num_threads
         #Start-finish line
         self.start = (ctrX + self.start_finish_D/2, ctrY + int(-aveRadius),0)   
         self.finish = (ctrX - self.start_finish_D/2, ctrY + int(-aveRadius),0)
         self.add_rect((self.start[0]+self.finish[0])/2.0, (self.finish[1]+self.start[1])/2.0, self.start[2],
                                     self.start_finish_D/2)
-        self.endline=[Rect(self.finish[0],self.finish[1],self.finish[2],self.start_finish_D/2)]
-        
+        self._set_endline([Rect(self.finish[0],self.finish[1],self.finish[2],self.start_finish_D/2)])
+
     @classmethod
-    def generate(cls,ctrX,ctrY,aveRadius, numSeg,bar=False):
+    def generate(cls,ctrX,ctrY,aveRadius, numSeg,bar=False,num_threads=1):
         """
         Creates random track
         :param ctrX,ctrY: Center of the track 
         :param aveRadius: Average radius of the track
         :param numSeg: Average number of segments
         :param bar: Toggles the progress bar when using joint_points
+        :param num_threads: Number of threads used to evaluate fitness in join_points
         :return: generated track
         """
-        track=cls(ctrX,ctrY,aveRadius,bar)
+        track=cls(ctrX,ctrY,aveRadius,bar,num_threads)
         if track._generate_track(numSeg):
             return track
         else:
-            return cls.generate(ctrX,ctrY,aveRadius, numSeg,bar)
+            return cls.generate(ctrX,ctrY,aveRadius, numSeg,bar,num_threads)
 
     def gen_points(self, segments,pd):
         """
@@ -165,15 +179,66 @@ class Track_Generator(object):
             points += seg.points_list(pd)
         return points
 
+    def gen_array(self, segments, pd):
+        """
+        Generates the points of a segment list
+        :param segments: List of Segment objects
+        :param pd: Distance between points
+        :return: 2d array of points
+        """
+        if len(segments) == 0:
+            return np.zeros((0, 2))
+        return np.concatenate([seg.get_points(pd) for seg in segments])
+
     def get_points(self,pd):
         """
         Generates the points of the track
         :param pd: Distance between points
         :return: List of points tuples
         """
+        if pd == self.CHECK_PD:
+            return self.track_points.tolist()
         points=self.gen_points(self.segments,pd)
         return points
 
+    @property
+    def track_points(self):
+        """
+        Points of the track at CHECK_PD distance, read-only view of the point buffer.
+        :return: 2d array of points
+        """
+        points = self._points[:self._nb_points]
+        points.flags.writeable = False
+        return points
+
+    def _add_segments(self, segments):
+        """
+        Appends accepted segments to the track and their points to the point buffer
+        :param segments: List of Segment objects
+        """
+        points = self.gen_array(segments, self.CHECK_PD)
+        n = self._nb_points + len(points)
+        if n > len(self._points):
+            # Grow capacity geometrically so appends are amortized O(1)
+            buf = np.zeros((max(n, 2 * len(self._points)), 2))
+            buf[:self._nb_points] = self._points[:self._nb_points]
+            self._points = buf
+        self._points[self._nb_points:n] = points
+        self._nb_points = n
+        self._grid.insert(points)
+        self.segments += segments
+
+    def _set_endline(self, endline):
+        """
+        Sets the end section of the track and caches its points
+        :param endline: List of Segment objects
+        """
+        self.endline = endline
+        self._endline_points = self.gen_array(endline, self.CHECK_PD)
+        self._grid = CollisionGrid(self.CHECK_TH)
+        self._grid.insert(self._endline_points)
+        self._grid.insert(self.track_points)
+
     def get_vect(self):
         """
         Generates points vectors of the track
@@ -198,18 +263,17 @@ class Track_Generator(object):
         """
         Generates a list of the curvature change markers
         plus the start and end markers location in track
-        :param pd: Distance between points
-        :return: List start+[markers]+end
+        :return: List start+[markers]+end of (x,y,ang) tuples
         """
         marks=[]
         marks.append(self.start)
         lC=0
         for s in self.segments:
             c=s.da/s.ds
-            if not math.isclose(c,lC,abs_tol=1e6):
+            if not math.isclose(c,lC,abs_tol=1e-6):
                 marks.append(s.end)
             lC=c
-        marks.append(self.end)
+        marks.append(self.finish)
         return marks
 
     def add_rect(self,x0,y0,cAng,ds):
@@ -222,7 +286,7 @@ class Track_Generator(object):
         """
         r=Rect(x0,y0,cAng,ds)
         if self.check_seg([r]):
-            self.segments.append(r)
+            self._add_segments([r])
             return True
         else:
             return False
@@ -238,7 +302,7 @@ class Track_Generator(object):
         """
         c=Curve(x0,y0,cAng,da,ds)
         if self.check_seg([c]):
-            self.segments.append(c)
+            self._add_segments([c])
             return True
         else:
             return False
@@ -277,7 +341,7 @@ class Track_Generator(object):
             cX,cY,cAng=curves[-1].end
 
         if self.check_seg(curves):
-            self.segments+=curves
+            self._add_segments(curves)
             return True
         else:
             return False
@@ -317,7 +381,7 @@ class Track_Generator(object):
         cross.append(rect2)
         cAng=np.arctan2(np.sin(cAng+da),np.cos(cAng+da))
         if self.check_seg(cross):
-            self.segments+=cross
+            self._add_segments(cross)
             return True
         else:
             return False
@@ -334,18 +398,23 @@ class Track_Generator(object):
         :param itmax: Maximum number of iterations
         :return: Solution Segment list and error
         """
-        track=self.get_points(pd=50)
-        pre=self.gen_points(preSegments,pd=50)
-        post=self.gen_points(postSegments,pd=50)
+        if preSegments is self.endline:
+            pre=self._endline_points
+        else:
+            pre=self.gen_array(preSegments,self.CHECK_PD)
+        post=self.gen_array(postSegments,self.CHECK_PD)
 
         #Close curve
-        ob = {"track":np.array(pre[1:-1]+track+post),
+        grid=CollisionGrid(self.CHECK_TH)
+        grid.insert(np.concatenate((pre[1:-1],self.track_points,post)))
+        ob = {"grid":grid,
             "start":p1,
-            "end":p2}
+            "end":p2,
+            "num_threads":self.num_threads}
         #Boundaries of the solution [length, curvature(1/R)] where sign of curvature determines direction
         bounds=[ (200,4000), (-(1/100), (1/100))]*numCurves
-        closure,err = diff_evolution(curves_fitness,ob,bounds,
-            mut=0.2,crossp=0.9,popsize=100,its=itmax,stopf=1.0,bar=self.bar)
+        closure,err = diff_evolution(curves_fitness_batch,ob,bounds,
+            mut=0.2,crossp=0.9,popsize=100,its=itmax,stopf=1.0,bar=self.bar,batch=True)
         sol=[]
         cX,cY,cAng=p1
         for ds,cur in closure.reshape((numCurves,2)):
@@ -375,22 +444,28 @@ class Track_Generator(object):
         """
         if len(self.segments)==0:
             return True
-        seg=self.gen_points(seg_list,pd=50)
-        track=self.get_points(pd=50)
-        extra=self.gen_points(extraSegments,pd=50)
-        endline=self.gen_points(self.endline, pd=50)
-        seg_points=np.array(seg)
-        track_points=np.array(extra+endline+track)
-        if collision_dect(seg_points,track_points,th=100):
+        seg_points=self.gen_array(seg_list,self.CHECK_PD)
+        if len(extraSegments)==0:
+            grid=self._grid
+        else:
+            grid=CollisionGrid(self.CHECK_TH)
+            grid.insert(np.concatenate((self.gen_array(extraSegments,self.CHECK_PD),self._endline_points,
+                                        self.track_points)))
+        if grid.collides(seg_points,th=self.CHECK_TH):
             return False
-        track_points=np.append(track_points,seg_points,axis=0)
-        cX,cY,cAng=seg_list[-1].end
-        c1= get_curve(cX,cY,cAng,np.pi,np.pi*150,pd=50)
-        if collision_dect(c1,track_points,th=100):
-            c2= get_curve(cX,cY,cAng,-np.pi,np.pi*150,pd=50)
-            if collision_dect(c2,track_points,th=100):
-                return False
-        return True
+        #Stuck test, segment points are added to the grid only for the test
+        n=grid.size()
+        grid.insert(seg_points)
+        try:
+            cX,cY,cAng=seg_list[-1].end
+            c1= get_curve(cX,cY,cAng,np.pi,np.pi*150,pd=50)
+            if grid.collides(c1,th=self.CHECK_TH):
+                c2= get_curve(cX,cY,cAng,-np.pi,np.pi*150,pd=50)
+                if grid.collides(c2,th=self.CHECK_TH):
+                    return False
+            return True
+        finally:
+            grid.truncate(n)
             
 
     def _generate_track(self, numSeg):
@@ -409,11 +484,11 @@ class Track_Generator(object):
         pre_finish= (self.ctr[0] - self.start_finish_D/2 - random.randint(250,self.aveRadius-500), self.ctr[1] + int(-self.aveRadius))
         
         #End section
-        self.endline.insert(0,Rect(pre_finish[0],pre_finish[1],self.finish[2],self.finish[0]-pre_finish[0]))
+        self._set_endline([Rect(pre_finish[0],pre_finish[1],self.finish[2],self.finish[0]-pre_finish[0])]+self.endline)
         #points.append(post_start)
 
         #First curve
-        self.segments.append(Curve.random_curve(cX,cY,cAng,500,500,np.pi,1))
+        self._add_segments([Curve.random_curve(cX,cY,cAng,500,500,np.pi,1)])
         cX,cY,cAng = self.segments[-1].end
         remSeg-=1
 
@@ -438,7 +513,7 @@ class Track_Generator(object):
                     continue
                 cur=Curve.random_curve(cX,cY,cAng,500,1000,damax,dirct)
                 if self.check_seg([cur]):
-                    self.segments.append(cur)
+                    self._add_segments([cur])
                     remSeg-=1
                     lSeg=0
                     print("Added Curve")
@@ -485,8 +560,7 @@ class Track_Generator(object):
         closure,err=self.join_points((cX,cY,cAng),pre_finish+(0,),self.endline)
         if err > 50:
             closure,err=self.join_points((cX,cY,cAng),pre_finish+(0,),self.endline,numCurves=4)
-        self.segments+=closure
-        self.segments+=self.endline
+        self._add_segments(closure+self.endline)
         if err < 20:
             return True
         else: 
@@ -1,5 +1,9 @@
 from .track import Track
 import os
+import tempfile
+
+import cv2
+import pybullet as p
 
 obj_string = r"""# Autogenerated .obj file for pybullet simulation.
 mtllib {mtl_file}
@@ -107,4 +111,60 @@ def build_track_plane(track: Track, border_w=0.3, ppm=1000, path=None):
     with open(urdf_save_path, "w") as f:
         f.write(urdf)
 
-    return img
\ No newline at end of file
+    return img
+
+class TrackPlane:
+    """
+    Track plane created directly in pybullet from shapes, without .obj and .urdf files. Texture is only written and
+    loaded when track plane is rendered by pybullet, see load_texture().
+    """
+
+    def __init__(self, pb_client, track: Track, img, border_w=0.3, origins=((0., 0.),), texture_dir=None):
+        """
+        Create track plane bodies.
+        :param pb_client: pybullet client
+        :param track: Track instance
+        :param img: rendered track image, BGR array as returned by Track.render()
+        :param border_w: track outside border width in meters, same as used to render image
+        :param origins: list of (x, y) plane center positions, one plane body is created at each
+        :param texture_dir: directory for temporary texture file, if None system temp directory is used
+        """
+        self.pb_client = pb_client
+        self.img = img
+        self.texture_dir = texture_dir
+        self.texture = None
+
+        # Sizes are rounded as in .urdf and .obj files, simulation and rendering are then identical to loaded plane
+        w = float("{:.6f}".format(track.width + 2 * border_w))
+        h = float("{:.6f}".format(track.height + 2 * border_w))
+        collision = pb_client.createCollisionShape(p.GEOM_BOX, halfExtents=[w / 2, h / 2, 5],
+                                                   collisionFramePosition=[0, 0, -5])
+        # Same quad and texture coordinates as .obj plane
+        x = float("{:.6f}".format((track.width + 2 * border_w) / 2))
+        y = float("{:.6f}".format((track.height + 2 * border_w) / 2))
+        visual = pb_client.createVisualShape(p.GEOM_MESH, vertices=[[x, -y, 0], [x, y, 0], [-x, y, 0], [-x, -y, 0]],
+                                             indices=[0, 1, 2, 0, 2, 3], uvs=[[1, 0], [1, 1], [0, 1], [0, 0]],
+                                             normals=[[0, 0, 1]] * 4, rgbaColor=[1, 1, 1, 1])
+        self.bodies = []
+        for origin in origins:
+            body = pb_client.createMultiBody(0, collision, visual, basePosition=[*origin, 0.])
+            # Friction and margin of plane loaded from .urdf
+            pb_client.changeDynamics(body, -1, lateralFriction=1., collisionMargin=0.001)
+            self.bodies.append(body)
+
+    def load_texture(self):
+        """
+        Apply track image as texture of plane bodies, if not applied yet. Image is passed to pybullet as an uncompressed
+        .bmp file, removed after loading.
+        """
+        if self.texture is not None:
+            return
+        fd, path = tempfile.mkstemp(suffix=".bmp", dir=self.texture_dir)
+        os.close(fd)
+        try:
+            cv2.imwrite(path, self.img)
+            self.texture = self.pb_client.loadTexture(path)
+        finally:
+            os.remove(path)
+        for body in self.bodies:
+            self.pb_client.changeVisualShape(body, -1, textureUniqueId=self.texture)
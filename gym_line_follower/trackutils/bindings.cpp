@@ -1,5 +1,7 @@
 #include <pybind11/pybind11.h>
+#include <pybind11/stl.h>
 #include "collision.hpp"
+#include "fitness.hpp"
 #include "primitives.hpp"
 
 namespace py = pybind11;
@@ -24,6 +26,21 @@ PYBIND11_MODULE(trackutils, m) {
     m.def("collision_dect", &collision_dect, "Function to detect collisions in track",
     	  py::arg("seg"),py::arg("track"),py::arg("th"));
 
+    py::class_<CollisionGrid>(m, "CollisionGrid")
+            .def(py::init<double>(), py::arg("cell_size"))
+            .def("insert", (void (CollisionGrid::*)(py::array_t<double, py::array::c_style | py::array::forcecast>))
+                 &CollisionGrid::insert, py::arg("points"))
+            .def("truncate", &CollisionGrid::truncate, py::arg("n"))
+            .def("collides", (bool (CollisionGrid::*)(py::array_t<double, py::array::c_style | py::array::forcecast>,
+                                                      double) const) &CollisionGrid::collides,
+                 py::arg("seg"), py::arg("th"))
+            .def("size", &CollisionGrid::size)
+            .def("__len__", &CollisionGrid::size)
+            .def_property_readonly("cell_size", &CollisionGrid::cell_size);
+
+    m.def("curves_fitness_batch", &curves_fitness_batch, "Function to evaluate fitness of curve solutions",
+          py::arg("population"),py::arg("grid"),py::arg("start"),py::arg("end"),py::arg("num_threads")=1);
+
     m.def("collision_dect2", &collision_dect2, "Function to detect collisions in track",
     	  py::arg("seg"),py::arg("track"),py::arg("th"));
 }
@@ -81,3 +81,93 @@ int collision_dect2(py::array_t<double> seg,
     return 0;
 }
 
+
+CollisionGrid::CollisionGrid(double cell_size): m_cell_size(cell_size){
+    if (!(cell_size > 0))
+        throw std::invalid_argument("Cell size must be positive.");
+}
+
+bool CollisionGrid::cell(double x, double y, std::pair<int64_t, int64_t> &c) const{
+    if (!std::isfinite(x) || !std::isfinite(y))
+        return false;
+    c.first = (int64_t)floor(x / m_cell_size);
+    c.second = (int64_t)floor(y / m_cell_size);
+    return true;
+}
+
+void CollisionGrid::insert(py::array_t<double, py::array::c_style | py::array::forcecast> points){
+    if (points.size() == 0)
+        return;
+    if (points.ndim() != 2 || points.shape(1) != 2)
+        throw std::invalid_argument("Points must be an array shape (n, 2).");
+    insert(points.data(), points.shape(0));
+}
+
+void CollisionGrid::insert(const double *points, ssize_t n){
+    std::pair<int64_t, int64_t> c;
+    for (ssize_t i = 0; i < n; ++i){
+        double x = points[2*i];
+        double y = points[2*i+1];
+        if (cell(x, y, c))
+            m_cells[c].push_back(m_x.size());
+        m_x.push_back(x);
+        m_y.push_back(y);
+    }
+}
+
+void CollisionGrid::truncate(ssize_t n){
+    if (n < 0)
+        throw std::invalid_argument("Size must not be negative.");
+    std::pair<int64_t, int64_t> c;
+    //Points are the last entries of their cells
+    for (ssize_t i = size()-1; i >= n; --i){
+        if (cell(m_x[i], m_y[i], c))
+            m_cells[c].pop_back();
+        m_x.pop_back();
+        m_y.pop_back();
+    }
+}
+
+bool CollisionGrid::collides(py::array_t<double, py::array::c_style | py::array::forcecast> seg, double th) const{
+    if (seg.size() == 0)
+        return false;
+    if (seg.ndim() != 2 || seg.shape(1) != 2)
+        throw std::invalid_argument("Segment must be an array shape (m, 2).");
+    return collides(seg.data(), seg.shape(0), th);
+}
+
+bool CollisionGrid::collides(const double *seg, ssize_t m, double th) const{
+    if (th > m_cell_size)
+        throw std::invalid_argument("Threshold must not be larger than cell size.");
+    if (m == 0)
+        return false;
+    //Track points at the end that are close to the segment start are contiguous with the segment and are skipped,
+    //including the first point that is not close
+    ssize_t k = size()-1;
+    while (k >= 0 && !(fabs(seg[0]-m_x[k]) > th || fabs(seg[1]-m_y[k]) > th))
+        --k;
+    if (k <= 0)
+        return false;
+
+    std::pair<int64_t, int64_t> c, n;
+    for (ssize_t j = 0; j < m; ++j){
+        double x = seg[2*j];
+        double y = seg[2*j+1];
+        if (!cell(x, y, c))
+            continue;
+        for (n.first = c.first-1; n.first <= c.first+1; ++n.first){
+            for (n.second = c.second-1; n.second <= c.second+1; ++n.second){
+                auto it = m_cells.find(n);
+                if (it == m_cells.end())
+                    continue;
+                for (ssize_t i : it->second){
+                    if (i >= k)
+                        break;
+                    if (fabs(x-m_x[i]) < th && fabs(y-m_y[i]) < th)
+                        return true;
+                }
+            }
+        }
+    }
+    return false;
+}
@@ -4,6 +4,9 @@
 #include <pybind11/pybind11.h>
 #include <pybind11/numpy.h>
 #include <math.h>
+#include <stdint.h>
+#include <vector>
+#include <unordered_map>
 
 namespace py = pybind11;
 
@@ -27,4 +30,52 @@ int collision_dect2(py::array_t<double> seg,
                    py::array_t<double> track,
                    double th);
 
+//Uniform grid of track points for collision detection with L inf norm
+class CollisionGrid
+{
+public:
+    /*! Constructor, creates empty grid
+        \param cell_size Size of grid cells, must not be smaller than thresholds used in queries
+    */
+    CollisionGrid(double cell_size);
+
+    /*! Append points to the end of the track
+        \param points Array shape (n, 2)
+    */
+    void insert(py::array_t<double, py::array::c_style | py::array::forcecast> points);
+    void insert(const double *points, ssize_t n);
+
+    /*! Remove points from the end of the track
+        \param n Number of points to keep
+    */
+    void truncate(ssize_t n);
+
+    /*! Detect collision of a segment with the track, same result as collision_dect(seg, track, th)
+        \param seg Segment points to test, array shape (m, 2)
+        \param th Threshold to use
+        \return True if any segment point is closer than th to a track point outside of the contiguous tail
+    */
+    bool collides(py::array_t<double, py::array::c_style | py::array::forcecast> seg, double th) const;
+    bool collides(const double *seg, ssize_t m, double th) const;
+
+    ssize_t size() const { return m_x.size(); }
+    double cell_size() const { return m_cell_size; }
+
+private:
+    struct CellHash {
+        size_t operator()(const std::pair<int64_t, int64_t> &c) const {
+            return std::hash<int64_t>()(c.first * 73856093) ^ std::hash<int64_t>()(c.second * 19349663);
+        }
+    };
+
+    //Cell of a point, returns false for non finite points which never collide
+    bool cell(double x, double y, std::pair<int64_t, int64_t> &c) const;
+
+    double m_cell_size;
+    std::vector<double> m_x;
+    std::vector<double> m_y;
+    //Indices of points in each cell, in insertion order
+    std::unordered_map<std::pair<int64_t, int64_t>, std::vector<ssize_t>, CellHash> m_cells;
+};
+
 #endif  // GYMLINEFOLLOWER_GENETIC_COLLISION_H_
@@ -0,0 +1,87 @@
+#include "fitness.hpp"
+#include "primitives.hpp"
+#include <algorithm>
+#include <thread>
+#include <vector>
+
+//Fitness of one solution, grid is a private copy that is restored before returning
+static double curves_fitness(const double *curves, int num_curves, CollisionGrid &grid,
+                             const std::array<double, 3> &start, const std::array<double, 3> &end,
+                             std::vector<double> &pts){
+    ssize_t track_size = grid.size();
+    int n = num_curves-1;
+    double x = start[0];
+    double y = start[1];
+    double cAng = start[2];
+    double fit = 0;
+    for (int i = 0; i < num_curves; ++i){
+        double ds = curves[2*i];
+        double cur = curves[2*i+1];
+        double da = fabs(cur) >= 0.00025 ? cur*ds : 0;
+        if (da == 0)
+            calc_rect(pts, x, y, cAng, ds, 50);
+        else
+            calc_curve(pts, x, y, cAng, da, ds, 50);
+        ssize_t m = pts.size()/2;
+        if (m == 0)
+            continue;
+        //Last point of the last piece and of rects is not tested, it may touch the track it joins
+        ssize_t m_test = (i == n || da == 0) ? m-1 : m;
+        if (grid.collides(pts.data(), m_test, i == n ? 90 : 100))
+            fit += 10000;
+        x = pts[2*(m-1)];
+        y = pts[2*m-1];
+        grid.insert(pts.data(), m);
+        if (da != 0){
+            cAng += da;
+            cAng = atan2(sin(cAng), cos(cAng));
+        }
+    }
+    grid.truncate(track_size);
+    double pos_err = sqrt((end[0]-x)*(end[0]-x)+(end[1]-y)*(end[1]-y));
+    double ang_err = fabs(cAng-end[2]);
+    fit += pos_err+100*ang_err;
+    if (std::isnan(fit))
+        return 40000;
+    return fit;
+}
+
+py::array_t<double> curves_fitness_batch(py::array_t<double, py::array::c_style | py::array::forcecast> population,
+                                         const CollisionGrid &grid,
+                                         std::array<double, 3> start,
+                                         std::array<double, 3> end,
+                                         int num_threads){
+    if (population.ndim() != 2 || population.shape(1) % 2 != 0)
+        throw std::invalid_argument("Population must be an array shape (popsize, 2*numCurves).");
+    //Errors can not be raised from worker threads
+    if (grid.cell_size() < 100)
+        throw std::invalid_argument("Grid cell size must be at least 100.");
+    ssize_t popsize = population.shape(0);
+    int num_curves = population.shape(1)/2;
+    py::array_t<double> fitness(popsize);
+    const double *pop = population.data();
+    double *fit = fitness.mutable_data();
+
+    if (num_threads <= 0)
+        num_threads = std::max(1u, std::thread::hardware_concurrency());
+    num_threads = int(std::min<ssize_t>(num_threads, std::max<ssize_t>(popsize, 1)));
+
+    {
+        py::gil_scoped_release release;
+        //Each thread adds solution points to its own copy of the grid
+        auto worker = [&](ssize_t first, ssize_t last){
+            CollisionGrid local(grid);
+            std::vector<double> pts;
+            for (ssize_t i = first; i < last; ++i)
+                fit[i] = curves_fitness(pop + i*2*num_curves, num_curves, local, start, end, pts);
+        };
+        std::vector<std::thread> threads;
+        ssize_t chunk = (popsize + num_threads - 1)/num_threads;
+        for (int t = 1; t < num_threads; ++t)
+            threads.emplace_back(worker, std::min(t*chunk, popsize), std::min((t+1)*chunk, popsize));
+        worker(0, std::min(chunk, popsize));
+        for (auto &thread : threads)
+            thread.join();
+    }
+    return fitness;
+}
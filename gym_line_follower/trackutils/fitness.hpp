@@ -0,0 +1,25 @@
+#ifndef GYMLINEFOLLOWER_GENETIC_FITNESS_H_
+#define GYMLINEFOLLOWER_GENETIC_FITNESS_H_
+
+#include <pybind11/pybind11.h>
+#include <pybind11/numpy.h>
+#include <array>
+#include "collision.hpp"
+
+namespace py = pybind11;
+
+/*! Fitness of a population of curve solutions, same as genetic.fitness.curves_fitness() for each individual
+    \param population Solutions array shape (popsize, 2*numCurves), rows [ds1,cur1,ds2,cur2,...]
+    \param grid Collision grid of the track points, it is not modified
+    \param start Start point (x1,y1,ang1)
+    \param end End point (x2,y2,ang2)
+    \param num_threads Number of threads to evaluate population with, 0 for number of hardware threads
+    \return Fitness array shape (popsize,)
+*/
+py::array_t<double> curves_fitness_batch(py::array_t<double, py::array::c_style | py::array::forcecast> population,
+                                         const CollisionGrid &grid,
+                                         std::array<double, 3> start,
+                                         std::array<double, 3> end,
+                                         int num_threads);
+
+#endif  // GYMLINEFOLLOWER_GENETIC_FITNESS_H_
@@ -12,14 +12,15 @@ py::array_t<double> rect_p(double x0, double y0,
     return res;
 }
 
-py::array_t<double> get_rect(double x0, double y0,
-                             double cAng, double ds, int pd){
+void calc_rect(std::vector<double> &pts, double x0, double y0,
+               double cAng, double ds, int pd){
     int nPoints = int(ceil(ds/pd));
+    pts.resize(2*std::max(nPoints, 0));
+    if (nPoints <= 0)
+        return;
     double dx=pd*cos(cAng);
     double dy=pd*sin(cAng);
-    py::array_t<double> arr({ nPoints, 2 });
-    py::buffer_info buf = arr.request();
-    double *ptr = (double *) buf.ptr;
+    double *ptr = pts.data();
     double x = x0;
     double y = y0;
     for (int i = 0; i < (nPoints-1); ++i)
@@ -31,6 +32,14 @@ py::array_t<double> get_rect(double x0, double y0,
     }
     ptr[2*(nPoints-1)]=x0+ds*cos(cAng);
     ptr[2*nPoints-1]=y0+ds*sin(cAng);
+}
+
+py::array_t<double> get_rect(double x0, double y0,
+                             double cAng, double ds, int pd){
+    std::vector<double> pts;
+    calc_rect(pts, x0, y0, cAng, ds, pd);
+    py::array_t<double> arr({ ssize_t(pts.size()/2), ssize_t(2) });
+    std::copy(pts.begin(), pts.end(), arr.mutable_data());
     return arr;
 }
 
@@ -53,13 +62,11 @@ py::array_t<double> curve_p(double x0, double y0,
     return res;
 }
 
-py::array_t<double> get_curve(double x0, double y0,
-                              double cAng, double da, double ds,
-                              int pd){
+void calc_curve(std::vector<double> &pts, double x0, double y0,
+                double cAng, double da, double ds, int pd){
     int nPoints=int(round(ds/pd));
-    py::array_t<double> arr({ nPoints, 2 });
-    py::buffer_info buf = arr.request();
-    double *ptr = (double *) buf.ptr;
+    pts.resize(2*std::max(nPoints, 0));
+    double *ptr = pts.data();
     double temp[2];
 
     double r=ds/da;
@@ -69,5 +76,14 @@ py::array_t<double> get_curve(double x0, double y0,
         ptr[i*2] = temp[0];
         ptr[i*2+1] = temp[1];
     }
+}
+
+py::array_t<double> get_curve(double x0, double y0,
+                              double cAng, double da, double ds,
+                              int pd){
+    std::vector<double> pts;
+    calc_curve(pts, x0, y0, cAng, da, ds, pd);
+    py::array_t<double> arr({ ssize_t(pts.size()/2), ssize_t(2) });
+    std::copy(pts.begin(), pts.end(), arr.mutable_data());
     return arr;
-}
\ No newline at end of file
+}
@@ -5,6 +5,7 @@
 #include <pybind11/numpy.h>
 #include <math.h>
 #include <cmath>
+#include <vector>
 
 namespace py = pybind11;
 
@@ -49,4 +50,8 @@ py::array_t<double> get_curve(double x0, double y0,
                               double cAng, double da, double ds,
                               int pd);
 
+//Versions of get_rect() and get_curve() that write points to a vector, usable without the GIL
+void calc_rect(std::vector<double> &pts, double x0, double y0, double cAng, double ds, int pd);
+void calc_curve(std::vector<double> &pts, double x0, double y0, double cAng, double da, double ds, int pd);
+
 #endif  // GYMLINEFOLLOWER_GENETIC_PRIMITIVES_H_
@@ -1,8 +1,67 @@
+import os
+import tempfile
+
 import cv2
 import numpy as np
 
+from .irsensor import TrackImage
+
+
 class TrackRefImg:
-    def __init__(self,image, ppm):
+    def __init__(self,image, ppm, sat_file=None):
+        """
+        Reference image of the track for irsensor simulation.
+        :param image: rendered BGR track image
+        :param ppm: image resolution in pixels per meter
+        :param sat_file: optional .npy file of the summed-area table. If the file exists it is memory-mapped instead of
+                         built, otherwise the table is built and saved to it. Processes using the same file share the
+                         table through the page cache.
+        """
+        self.image = image
+        self.ppm = ppm
+        self.sat_file = sat_file
+        self._img = None
+        self._track_image = None
+
+    @property
+    def img(self):
+        """
+        Inverse reflectance image, computed on first access.
+        """
+        if self._img is None:
+            self._img = self._reflectance_image()
+        return self._img
+
+    def _reflectance_image(self):
         # Transofrm the track texture to an inverse reflectance image for irsensor simulation
-        self.img = np.array(255 - cv2.cvtColor(image, cv2.COLOR_BGR2GRAY), dtype=np.uint8)
-        self.ppm = ppm
\ No newline at end of file
+        return np.array(255 - cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY), dtype=np.uint8)
+
+    @property
+    def track_image(self):
+        """
+        Summed-area table of the image as irsensor.TrackImage, built on first access and shared by all sensors
+        created from this reference image.
+        """
+        if self._track_image is None:
+            self._track_image = self._load_track_image()
+        return self._track_image
+
+    def _load_track_image(self):
+        if self.sat_file is None:
+            track_image = TrackImage.from_image(self.img)
+            # Table holds all the sensor needs, reflectance image is recomputed if accessed again
+            self._img = None
+            return track_image
+        if os.path.exists(self.sat_file):
+            sat = np.load(self.sat_file, mmap_mode="r")
+            if sat.dtype == np.uint32 and sat.shape == (self.image.shape[0] + 1, self.image.shape[1] + 1):
+                return TrackImage(sat)
+        # Reflectance image is only needed to build the table, do not keep it
+        img = self._img if self._img is not None else self._reflectance_image()
+        track_image = TrackImage.from_image(img)
+        # Write to temporary file first so other processes never load a partially written table
+        fd, tmp_path = tempfile.mkstemp(suffix=".npy", dir=os.path.dirname(os.path.abspath(self.sat_file)))
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, track_image.sat)
+        os.replace(tmp_path, self.sat_file)
+        return TrackImage(np.load(self.sat_file, mmap_mode="r"))
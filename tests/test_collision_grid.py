@@ -0,0 +1,29 @@
+import numpy as np
+
+from gym_line_follower.trackutils import CollisionGrid, collision_dect
+
+
+def test_collision_grid_matches_collision_dect():
+    rng = np.random.RandomState(0)
+    nb_collisions = 0
+    for _ in range(2000):
+        scale = rng.choice([50., 200., 1000.])
+        # Random walk track, segment continues from its end
+        track = np.cumsum(rng.normal(0., scale / 5, size=(rng.randint(1, 60), 2)), axis=0)
+        seg = track[-1] + np.cumsum(rng.normal(0., scale / 5, size=(rng.randint(1, 20), 2)), axis=0)
+        th = rng.choice([90., 100.])
+
+        # Points inserted and truncated again must not affect result
+        grid = CollisionGrid(100.)
+        cut = rng.randint(len(track) + 1)
+        grid.insert(track[:cut])
+        grid.insert(rng.normal(0., scale, size=(5, 2)))
+        grid.truncate(cut)
+        grid.insert(track[cut:])
+        assert len(grid) == len(track)
+
+        expected = bool(collision_dect(seg, track, th=th))
+        assert grid.collides(seg, th) == expected
+        nb_collisions += expected
+    # Both outcomes are covered
+    assert 0 < nb_collisions < 2000
@@ -0,0 +1,31 @@
+import random
+
+import numpy as np
+
+import gym_line_follower.track_generator as tg
+from gym_line_follower.genetic.fitness import curves_fitness, curves_fitness_batch
+from gym_line_follower.trackutils import CollisionGrid
+
+
+def test_curves_fitness_batch_matches_python():
+    random.seed(3)
+    np.random.seed(3)
+    track_gen = tg.Track_Generator.generate(0, 0, 1750, numSeg=20)
+    grid = CollisionGrid(100)
+    grid.insert(np.concatenate((track_gen._endline_points, track_gen.track_points)))
+    nb_points = len(grid)
+
+    for segment in track_gen.segments[::4]:
+        for nb_curves in (3, 4):
+            track_obj = {"grid": grid, "start": segment.end, "end": track_gen.segments[-3].end}
+            bounds = np.array([(200, 4000), (-0.01, 0.01)] * nb_curves)
+            population = bounds[:, 0] + np.random.rand(50, 2 * nb_curves) * (bounds[:, 1] - bounds[:, 0])
+            population[::7, 1::2] *= 0.02  # Straight segments
+            expected = np.array([curves_fitness(curves, track_obj) for curves in population])
+            for num_threads in (1, 3):
+                track_obj["num_threads"] = num_threads
+                fitness = curves_fitness_batch(population, track_obj)
+                np.testing.assert_allclose(fitness, expected, rtol=1e-9)
+                assert np.array_equal(fitness >= 10000, expected >= 10000)
+            # Evaluated points are removed from grid
+            assert len(grid) == nb_points
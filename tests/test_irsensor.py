@@ -0,0 +1,99 @@
+import cv2
+import numpy as np
+
+from gym_line_follower.irsensor import IrSensor, TrackImage
+
+PPM = 1000
+SENSOR_ARGS = dict(track_ppm=PPM, ds=0.05, photo_heigth=0.02, array_size=5, photo_sep=0.015, photo_fov=60.)
+
+
+def random_image(seed, shape=(300, 400)):
+    # Blocks of dark and bright pixels with noise, so readings are not all equal
+    rng = np.random.RandomState(seed)
+    blocks = rng.randint(2, size=(shape[0] // 10, shape[1] // 10)).astype(np.uint8) * 255
+    img = cv2.resize(blocks, (shape[1], shape[0]), interpolation=cv2.INTER_NEAREST).astype(np.int32)
+    return np.clip(img + rng.randint(-40, 40, size=shape), 0, 255).astype(np.uint8)
+
+
+def brute_force_reading(img, pos, radius):
+    """
+    Mean of pixels inside sensor disk divided by 255 and rounded, pixels outside of image count as 0.
+    """
+    if radius < 1:
+        offsets = [(0, 0)]
+    else:
+        offsets = [(dx, dy) for dy in range(-radius + 1, radius) for dx in range(-radius, radius + 1)
+                   if dx * dx + dy * dy < radius * radius]
+    total = 0
+    for dx, dy in offsets:
+        x, y = pos[0] + dx, pos[1] + dy
+        if 0 <= x < img.shape[1] and 0 <= y < img.shape[0]:
+            total += int(img[y, x])
+    return min(max(np.floor(total / len(offsets) / 255. + 0.5), 0.), 1.)
+
+
+def photo_positions(img, x, y, yaw):
+    args = SENSOR_ARGS
+    offset = args["photo_sep"] * (args["array_size"] - 1) / 2.
+    pos = np.array([x + args["ds"] * np.cos(yaw) - offset * np.sin(yaw),
+                    y + args["ds"] * np.sin(yaw) + offset * np.cos(yaw)])
+    step = np.array([args["photo_sep"] * np.sin(yaw), -args["photo_sep"] * np.cos(yaw)])
+    out = []
+    for i in range(args["array_size"]):
+        px, py = (pos + step * i) * PPM
+        # std::round rounds half away from zero
+        px, py = np.sign(px) * np.floor(abs(px) + 0.5), np.sign(py) * np.floor(abs(py) + 0.5)
+        out.append((img.shape[1] // 2 + int(px), img.shape[0] // 2 - int(py)))
+    return out
+
+
+def random_poses(rng, img, n):
+    half_w, half_h = img.shape[1] / 2. / PPM, img.shape[0] / 2. / PPM
+    xs = rng.uniform(-half_w - 0.05, half_w + 0.05, size=n)
+    ys = rng.uniform(-half_h - 0.05, half_h + 0.05, size=n)
+    # Half of the poses close to the image border, sensor disks are clipped
+    xs[::2] = np.sign(xs[::2]) * (half_w - rng.uniform(-0.02, 0.06, size=len(xs[::2])))
+    return xs, ys, rng.uniform(-np.pi, np.pi, size=n)
+
+
+def test_read_matches_brute_force():
+    rng = np.random.RandomState(0)
+    img = random_image(0)
+    sensor = IrSensor(TrackImage.from_image(img), **SENSOR_ARGS)
+    radius = sensor.get_sen_radius()
+    assert radius > 1
+
+    nb_clipped = 0
+    for x, y, yaw in zip(*random_poses(rng, img, 200)):
+        sensor.update(x, y, yaw)
+        positions = [tuple(pos) for pos in sensor.get_photo_pos()]
+        assert positions == photo_positions(img, x, y, yaw)
+        expected = [brute_force_reading(img, pos, radius) for pos in positions]
+        np.testing.assert_array_equal(sensor.read(), expected)
+        nb_clipped += any(not (radius <= px < img.shape[1] - radius and radius <= py < img.shape[0] - radius)
+                          for px, py in positions)
+    assert nb_clipped > 20
+
+
+def test_read_batch_matches_read():
+    rng = np.random.RandomState(1)
+    img = random_image(1)
+    sensor = IrSensor(img, **SENSOR_ARGS)
+    xs, ys, yaws = random_poses(rng, img, 100)
+    readings = sensor.read_batch(xs, ys, yaws)
+    assert readings.shape == (100, SENSOR_ARGS["array_size"])
+    for reading, x, y, yaw in zip(readings, xs, ys, yaws):
+        expected = [brute_force_reading(img, pos, sensor.get_sen_radius()) for pos in photo_positions(img, x, y, yaw)]
+        np.testing.assert_array_equal(reading, expected)
+        sensor.update(x, y, yaw)
+        np.testing.assert_array_equal(reading, sensor.read())
+
+
+def test_subpixel_sensor_reads_single_pixel():
+    img = random_image(2)
+    sensor = IrSensor(img, **dict(SENSOR_ARGS, photo_heigth=0.0005))
+    assert sensor.get_sen_radius() == 0
+    for pos in [(0., 0.), (0.15, 0.1)]:
+        sensor.update(pos[0], pos[1], 0.3)
+        expected = [brute_force_reading(img, tuple(p), 0) for p in sensor.get_photo_pos()]
+        np.testing.assert_array_equal(sensor.read(), expected)
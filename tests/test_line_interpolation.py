@@ -0,0 +1,73 @@
+import numpy as np
+from shapely.geometry import LineString
+
+from gym_line_follower.line_interpolation import interpolate_points, sort_points
+
+
+def shapely_interpolate_points(points, nb_out_points=None, segment_length=None):
+    """
+    Previous implementation of interpolate_points() based on shapely.
+    """
+    line = LineString(points)
+    length = line.length
+    if nb_out_points is not None:
+        nr_segments = nb_out_points - 1
+        segment_length = length / nr_segments
+    else:
+        nr_segments = int(length // segment_length)
+    new_points = []
+    for i in range(nr_segments + 1):
+        if i * segment_length > length + 1e-6:
+            break
+        new_points.append(line.interpolate(i * segment_length).coords[0])
+    return np.array(new_points)
+
+
+def greedy_sort_points(points, origin=(0, 0), max_gap=30e-3):
+    """
+    Previous implementation of sort_points(), quadratic nearest neighbour search.
+    """
+    points = np.array(points)
+    nearest_idx = np.argmin(np.linalg.norm(points - np.asarray(origin), axis=1))
+    out = [points[nearest_idx]]
+    points = np.delete(points, nearest_idx, axis=0)
+    while len(points) > 0:
+        dist = np.linalg.norm(points - out[-1], axis=1)
+        next_idx = np.argmin(dist)
+        if dist[next_idx] > max_gap:
+            break
+        out.append(points[next_idx])
+        points = np.delete(points, next_idx, axis=0)
+    return np.array(out)
+
+
+def test_interpolate_points_matches_shapely():
+    rng = np.random.RandomState(0)
+    for _ in range(50):
+        points = np.cumsum(rng.uniform(-1., 1., size=(rng.randint(2, 30), 2)), axis=0)
+        for nb_out_points in (2, 7, 50):
+            np.testing.assert_allclose(interpolate_points(points, nb_out_points=nb_out_points),
+                                       shapely_interpolate_points(points, nb_out_points=nb_out_points), atol=1e-9)
+        for segment_length in (0.1, 0.7):
+            np.testing.assert_allclose(interpolate_points(points, segment_length=segment_length),
+                                       shapely_interpolate_points(points, segment_length=segment_length), atol=1e-9)
+
+
+def test_interpolate_points_single_point():
+    assert np.array_equal(interpolate_points(np.array([[1., 2.]]), nb_out_points=5), [[1., 2.]])
+
+
+def test_sort_points_matches_greedy_sort():
+    rng = np.random.RandomState(1)
+    t = np.linspace(0., 2 * np.pi, 400, endpoint=False)
+    line = np.stack((np.cos(t), 0.7 * np.sin(t)), axis=-1)
+    for _ in range(20):
+        # Visible part of the line in random order, with noise and occasional gap
+        start = rng.randint(len(line))
+        points = np.roll(line, -start, axis=0)[:rng.randint(5, 100)]
+        points = points + rng.normal(0., 1e-3, size=points.shape)
+        if rng.rand() < 0.5:
+            points = np.delete(points, slice(len(points) // 2, len(points) // 2 + 3), axis=0)
+        points = points[rng.permutation(len(points))]
+        origin = points[rng.randint(len(points))] + rng.normal(0., 0.01, size=2)
+        np.testing.assert_allclose(sort_points(points, origin), greedy_sort_points(points, origin))
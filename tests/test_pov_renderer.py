@@ -0,0 +1,55 @@
+import numpy as np
+import pybullet as p
+
+from gym_line_follower.envs import LineFollowerEnv
+from gym_line_follower.pov_renderer import PovRenderer
+
+
+def project(point, eye, target, fov, resolution):
+    """
+    Project world point to output pixel coordinates with pybullet camera matrices.
+    """
+    width, height = resolution
+    view = np.reshape(p.computeViewMatrix(eye, target, (0., 0., 1.)), (4, 4)).T
+    projection = np.reshape(p.computeProjectionMatrixFOV(fov, width / height, 0.01, 10.), (4, 4)).T
+    clip = projection @ view @ np.append(point, 1.)
+    x, y = clip[:2] / clip[3]
+    return np.array([(x + 1.) / 2. * width - 0.5, (1. - y) / 2. * height - 0.5])
+
+
+def test_homography_maps_pixel_to_ground_point():
+    plane_size = (2., 1.5)
+    track_img = np.zeros((600, 800, 3), dtype=np.uint8)
+    resolution = (320, 240)
+    renderer = PovRenderer(track_img, plane_size, resolution=resolution, fov=49)
+    rng = np.random.RandomState(0)
+    for _ in range(20):
+        eye = np.append(rng.uniform(-0.5, 0.5, size=2), rng.uniform(0.05, 0.3))
+        target = np.append(eye[:2] + rng.uniform(-0.3, 0.3, size=2), 0.)
+        homography = renderer.get_homography(eye, target)
+        for point in [target[:2], target[:2] + rng.uniform(-0.02, 0.02, size=2)]:
+            pixel = project(np.append(point, 0.), eye, target, 49, resolution)
+            texture = homography @ np.append(pixel, 1.)
+            # Track image pixel centers are at integer coordinates, image covers the whole plane
+            expected = [(point[0] / plane_size[0] + 0.5) * 800 - 0.5, (0.5 - point[1] / plane_size[1]) * 600 - 0.5]
+            # pybullet matrices are float32
+            np.testing.assert_allclose(texture[:2] / texture[2], expected, atol=1e-3)
+
+
+def test_camera_fast_matches_camera_render():
+    observations = []
+    for obsv_type in ("camera", "camera_fast"):
+        env = LineFollowerEnv(gui=False, obsv_type=obsv_type, randomize=False, camera_channels="binary",
+                              camera_resolution=(160, 120))
+        try:
+            env.reset()
+            for _ in range(5):
+                observation = env.step((0.5, 0.5))[0]
+            observations.append(observation > 0)
+        finally:
+            env.close()
+    camera, camera_fast = observations
+    assert camera.sum() > 0.02 * camera.size
+    # Line pixels of software render overlap line pixels of pybullet render
+    iou = np.logical_and(camera, camera_fast).sum() / np.logical_or(camera, camera_fast).sum()
+    assert iou > 0.8
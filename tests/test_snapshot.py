@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from gym_line_follower.envs import LineFollowerEnv, LineFollowerVecEnv
+
+
+def run(env, actions):
+    return [env.step(action)[:3] for action in actions]
+
+
+def assert_same_results(results, expected):
+    for (observation, reward, done), (exp_observation, exp_reward, exp_done) in zip(results, expected):
+        np.testing.assert_array_equal(observation, exp_observation)
+        np.testing.assert_array_equal(reward, exp_reward)
+        np.testing.assert_array_equal(done, exp_done)
+
+
+def test_restore_repeats_episode():
+    env = LineFollowerEnv(gui=False, obsv_type="points_latch", randomize=False)
+    try:
+        env.reset()
+        run(env, [(0.5, 0.6)] * 10)
+        handle = env.snapshot()
+        actions = np.random.RandomState(0).uniform(0.2, 0.8, size=(30, 2))
+        expected = run(env, actions)
+        for _ in range(2):
+            # Snapshot is kept and can be restored again
+            env.restore(handle)
+            assert_same_results(run(env, actions), expected)
+    finally:
+        env.close()
+
+
+def test_vec_env_restore_repeats_episode():
+    env = LineFollowerVecEnv(num_envs=3, obsv_type="points_latch", randomize=False)
+    try:
+        env.reset()
+        handle = env.snapshot()
+        actions = np.random.RandomState(1).uniform(0.2, 0.8, size=(20, 3, 2))
+        expected = run(env, actions)
+        env.restore(handle)
+        assert_same_results(run(env, actions), expected)
+    finally:
+        env.close()
+
+
+def test_snapshots_removed_on_reset():
+    env = LineFollowerEnv(gui=False, obsv_type="points_latch", randomize=False, snapshot_pool_size=2)
+    try:
+        env.reset()
+        handles = [env.snapshot() for _ in range(3)]
+        # Least recently used snapshot was evicted
+        with pytest.raises(KeyError):
+            env.restore(handles[0])
+        env.restore(handles[2])
+        env.reset()
+        with pytest.raises(KeyError):
+            env.restore(handles[2])
+    finally:
+        env.close()
@@ -0,0 +1,72 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from gym_line_follower.texture_cache import TEXTURE_DIR, TEXTURE_FILES, TextureCache
+
+
+@pytest.fixture
+def texture_dir(tmp_path):
+    # Copy of texture files, tests remove files to check that cached textures are not decoded again
+    for file_name in TEXTURE_FILES.values():
+        if os.path.exists(os.path.join(TEXTURE_DIR, file_name)):
+            shutil.copy(os.path.join(TEXTURE_DIR, file_name), str(tmp_path))
+    return str(tmp_path)
+
+
+def remove_texture(texture_dir, name):
+    os.remove(os.path.join(texture_dir, TEXTURE_FILES[name]))
+
+
+def test_original_is_decoded_once(texture_dir):
+    cache = TextureCache(texture_dir=texture_dir)
+    original = cache.get("brick")
+    remove_texture(texture_dir, "brick")
+    a = cache.get("brick", (120, 80))
+    b = cache.get("brick", (90, 70))
+    assert cache.get("brick") is original
+    assert a.shape == (80, 120, 3) and b.shape == (70, 90, 3)
+    assert not a.flags.writeable and not original.flags.writeable
+
+
+def test_resized_textures_are_not_cached_by_default(texture_dir):
+    cache = TextureCache(texture_dir=texture_dir)
+    a = cache.get("brick", (100, 50))
+    b = cache.get("brick", (100, 50))
+    assert a is not b
+    assert np.array_equal(a, b)
+
+
+def test_kept_size_is_reused(texture_dir):
+    cache = TextureCache(texture_dir=texture_dir)
+    a = cache.get("brick", (120, 80), keep=True)
+    assert cache.get("brick", (120, 80)) is a
+
+
+def test_preload_sizes(texture_dir):
+    cache = TextureCache(texture_dir=texture_dir)
+    assert cache.preload(["brick", "white"], sizes=[(64, 48)]) == ["brick"]
+    remove_texture(texture_dir, "brick")
+    resized = cache.get("brick", (64, 48))
+    assert resized.shape == (48, 64, 3)
+    assert cache.get("brick", (64, 48)) is resized
+
+
+def test_preload_warns_about_missing_file(texture_dir):
+    remove_texture(texture_dir, "concrete")
+    cache = TextureCache(texture_dir=texture_dir)
+    with pytest.warns(UserWarning, match="concrete"):
+        assert cache.preload(["concrete", "brick"]) == ["brick"]
+
+
+def test_memory_limit(texture_dir):
+    cache = TextureCache(texture_dir=texture_dir)
+    cache.max_memory = cache.get("brick").nbytes + 1
+    concrete = cache.get("concrete")
+    remove_texture(texture_dir, "brick")
+    # Least recently used texture was evicted and has to be decoded again
+    with pytest.raises(FileNotFoundError):
+        cache.get("brick")
+    assert cache.get("concrete") is concrete
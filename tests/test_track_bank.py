@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from gym_line_follower.track_bank import TrackBank, generate_track_bank
+
+
+def test_track_bank_reproducible_with_workers(tmp_path):
+    paths = []
+    for workers in (1, 2):
+        path = str(tmp_path / "bank_{}.zip".format(workers))
+        generate_track_bank(path, 4, seed=7, workers=workers)
+        paths.append(path)
+
+    single, parallel = TrackBank(paths[0]), TrackBank(paths[1])
+    assert len(single) == len(parallel) == 4
+    for i in range(len(single)):
+        assert np.array_equal(single.get_points(i), parallel.get_points(i))
+        assert single.get_metadata(i) == parallel.get_metadata(i)
+    single.close()
+    parallel.close()
+
+
+def test_env_closes_track_bank_opened_from_path(tmp_path):
+    from gym_line_follower.envs import LineFollowerEnv
+
+    path = str(tmp_path / "bank.zip")
+    generate_track_bank(path, 2, seed=3)
+
+    env = LineFollowerEnv(gui=False, track_bank=path)
+    env.reset()
+    bank = env.track_bank
+    env.close()
+    with pytest.raises(ValueError):
+        bank.get_metadata(0)
+
+    # Bank passed as instance belongs to the caller and stays open
+    bank = TrackBank(path)
+    env = LineFollowerEnv(gui=False, track_bank=bank)
+    env.reset()
+    env.close()
+    assert bank.get_metadata(0)["seed"] is not None
+    bank.close()
@@ -0,0 +1,85 @@
+import os
+
+import numpy as np
+
+from gym_line_follower.track import Track
+from gym_line_follower.track_cache import TrackAssetCache
+
+
+def dir_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(path) for name in files)
+
+
+def random_track(seed):
+    return Track.generate(1.75, hw_ratio=0.7, seed=seed, spikeyness=0.3, nb_checkpoints=500)
+
+
+def test_ref_img_cache_stays_under_disk_limit(tmp_path):
+    cache = TrackAssetCache(cache_dir=str(tmp_path), max_disk=16 * 2**20)
+    for seed in range(5):
+        cache.get_track_ref_img(random_track(seed), ppm=500, persist=True)
+        assert 0 < dir_size(str(tmp_path)) <= cache.max_disk
+
+
+def test_ref_img_is_memoized(tmp_path):
+    cache = TrackAssetCache(cache_dir=str(tmp_path))
+    track = random_track(1)
+    ref_img = cache.get_track_ref_img(track, ppm=500, persist=True)
+    assert cache.get_track_ref_img(track, ppm=500) is ref_img
+
+    # New cache instance loads the table from disk
+    other = TrackAssetCache(cache_dir=str(tmp_path)).get_track_ref_img(track, ppm=500)
+    assert np.array_equal(other.track_image.sat, ref_img.track_image.sat)
+
+
+def test_ref_img_not_persisted_is_kept_in_memory(tmp_path):
+    cache = TrackAssetCache(cache_dir=str(tmp_path))
+    ref_img = cache.get_track_ref_img(random_track(2), ppm=500)
+    assert ref_img.sat_file is None
+    assert ref_img.track_image.width > 0
+    assert dir_size(str(tmp_path)) == 0
+    # Tracks that do not repeat are not memoized
+    assert cache.get_track_ref_img(random_track(2), ppm=500) is not ref_img
+
+
+def test_ref_img_counts_against_memory_limit(tmp_path):
+    track = random_track(3)
+    img = TrackAssetCache(cache_dir=str(tmp_path / "probe")).get_track_image(track, ppm=500)
+    sat_size = (img.shape[0] + 1) * (img.shape[1] + 1) * 4
+    # Room for rendered image and table of one track only
+    cache = TrackAssetCache(cache_dir=str(tmp_path / "cache"), max_memory=int(1.5 * (img.nbytes + sat_size)))
+    ref_img = cache.get_track_ref_img(track, ppm=500, persist=True)
+    assert cache.get_track_ref_img(track, ppm=500, persist=True) is ref_img
+
+    cache.get_track_ref_img(random_track(4), ppm=500, persist=True)
+    # Table of first track was evicted from memory, it is mapped from disk again
+    other = cache.get_track_ref_img(track, ppm=500, persist=True)
+    assert other is not ref_img
+    assert np.array_equal(other.track_image.sat, ref_img.track_image.sat)
+
+
+def test_env_cache_stays_under_disk_limit(tmp_path):
+    from gym_line_follower.envs import LineFollowerEnv
+
+    cache = TrackAssetCache(cache_dir=str(tmp_path), max_disk=50 * 2**20)
+    env = LineFollowerEnv(gui=False, obsv_type="ir_array", randomize=True, track_cache=cache)
+    try:
+        for _ in range(3):
+            env.reset()
+            # Randomized tracks do not repeat, their tables are not written
+            assert dir_size(str(tmp_path)) == 0
+    finally:
+        env.close()
+
+
+def test_env_persists_repeated_track(tmp_path):
+    from gym_line_follower.envs import LineFollowerEnv
+
+    cache = TrackAssetCache(cache_dir=str(tmp_path), max_disk=256 * 2**20)
+    env = LineFollowerEnv(gui=False, obsv_type="ir_array", randomize=False, track_cache=cache)
+    try:
+        for _ in range(2):
+            env.reset()
+            assert 0 < dir_size(str(tmp_path)) <= cache.max_disk
+    finally:
+        env.close()
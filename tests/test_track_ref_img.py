@@ -0,0 +1,51 @@
+import numpy as np
+
+from gym_line_follower.irsensor import IrSensor, TrackImage
+from gym_line_follower.track import Track
+from gym_line_follower.utils import TrackRefImg
+
+PPM = 500
+SENSOR_ARGS = dict(track_ppm=PPM, ds=0.05, photo_heigth=0.02, array_size=8, photo_sep=0.01, photo_fov=60.)
+
+
+def random_poses(seed, n=500):
+    rng = np.random.RandomState(seed)
+    return rng.uniform(-1.2, 1.2, size=n), rng.uniform(-0.9, 0.9, size=n), rng.uniform(-np.pi, np.pi, size=n)
+
+
+def test_mapped_table_reads_same_as_in_memory(tmp_path):
+    image = Track.generate(1.75, hw_ratio=0.7, seed=5, spikeyness=0.3, nb_checkpoints=500).render(ppm=PPM)
+    in_memory = TrackRefImg(image, PPM)
+    sat_file = str(tmp_path / "sat.npy")
+    written = TrackRefImg(image, PPM, sat_file=sat_file)
+    mapped = TrackRefImg(image, PPM, sat_file=sat_file)
+
+    # Table is written by the first instance and memory-mapped by the second, not copied
+    assert np.array_equal(written.track_image.sat, in_memory.track_image.sat)
+    assert np.array_equal(mapped.track_image.sat, in_memory.track_image.sat)
+    assert not mapped.track_image.sat.flags.writeable
+    assert (mapped.track_image.width, mapped.track_image.heigth) == (image.shape[1], image.shape[0])
+
+    poses = random_poses(0)
+    expected = IrSensor(in_memory.img, **SENSOR_ARGS).read_batch(*poses)
+    assert 0. < expected.mean() < 1.
+    for ref_img in (in_memory, mapped):
+        np.testing.assert_array_equal(IrSensor(ref_img.track_image, **SENSOR_ARGS).read_batch(*poses), expected)
+
+
+def test_shared_table_reads_same_as_private():
+    rng = np.random.RandomState(1)
+    img = rng.randint(256, size=(200, 300)).astype(np.uint8)
+    track_image = TrackImage.from_image(img)
+    # Sensors share one table, each reads the same as a sensor with a private table
+    shared = [IrSensor(track_image, **SENSOR_ARGS) for _ in range(3)]
+    private = IrSensor(img, **SENSOR_ARGS)
+    poses = (rng.uniform(-0.3, 0.3, 100), rng.uniform(-0.2, 0.2, 100), rng.uniform(-np.pi, np.pi, 100))
+    expected = private.read_batch(*poses)
+    for sensor in shared:
+        np.testing.assert_array_equal(sensor.read_batch(*poses), expected)
+
+    # Table wrapped from a read-only array reads the same
+    sat = track_image.sat.copy()
+    sat.flags.writeable = False
+    np.testing.assert_array_equal(IrSensor(TrackImage(sat), **SENSOR_ARGS).read_batch(*poses), expected)
@@ -0,0 +1,32 @@
+import numpy as np
+
+from gym_line_follower.envs import LineFollowerVecEnv
+
+
+def test_vec_env_stacks_results_and_resets_done_envs():
+    num_envs = 3
+    # Episodes end by time limit after a few steps
+    env = LineFollowerVecEnv(num_envs=num_envs, obsv_type="points_latch", max_time=0.2)
+    try:
+        env.seed(0)
+        observations = env.reset()
+        assert observations.shape == (num_envs, *env.observation_space.shape)
+        assert observations.dtype == env.observation_space.dtype
+
+        nb_done = 0
+        for _ in range(12):
+            observations, rewards, dones, infos = env.step(np.full((num_envs, 2), 0.5))
+            assert observations.shape == (num_envs, *env.observation_space.shape)
+            assert rewards.shape == (num_envs,) and rewards.dtype == np.float64
+            assert dones.shape == (num_envs,) and dones.dtype == bool
+            assert len(infos) == num_envs
+            for sub_env, done, info in zip(env.envs, dones, infos):
+                assert ("terminal_observation" in info) == done
+                if done:
+                    assert info["terminal_observation"].shape == env.observation_space.shape
+                    # Sub-environment was reset and continues with a new episode
+                    assert not sub_env.done and sub_env.step_counter == 0
+            nb_done += dones.sum()
+        assert nb_done >= num_envs
+    finally:
+        env.close()
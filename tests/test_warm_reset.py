@@ -0,0 +1,27 @@
+import numpy as np
+
+from gym_line_follower.envs import LineFollowerEnv
+
+
+def test_warm_reset_reuses_world():
+    warm = LineFollowerEnv(gui=False, obsv_type="points_latch", randomize=False, warm_reset=True)
+    cold = LineFollowerEnv(gui=False, obsv_type="points_latch", randomize=False)
+    try:
+        cold_observation = cold.reset()
+        first_observation = warm.reset()
+        track_plane, track_bodies, bot_body = warm.track_plane, list(warm.track_plane.bodies), warm.follower_bot.bot
+        np.testing.assert_array_equal(first_observation, cold_observation)
+
+        for _ in range(30):
+            warm.step((0.5, 0.6))
+        observation = warm.reset()
+
+        # Track plane and bot bodies were kept, bot was moved back to the start
+        assert warm.track_plane is track_plane
+        assert warm.track_plane.bodies == track_bodies
+        assert warm.follower_bot.bot == bot_body
+        np.testing.assert_array_equal(observation, cold_observation)
+        assert warm.step_counter == 0 and not warm.done
+    finally:
+        warm.close()
+        cold.close()